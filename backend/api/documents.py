@@ -1,83 +1,184 @@
+import hashlib
+import os
+import tempfile
 import time
-from fastapi import APIRouter, UploadFile, File, HTTPException
-import fitz
+from typing import List, Optional
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
 
-from services.vector_store_service import get_vector_store
-from services.embedding_service import get_embedding_model
-from utils.chunking import chunk_text
+from services.ingestion_service import ingest_pdf, ingest_pdfs_batch
+from services.vector_store_service import get_vector_store, resolve_namespace
+from utils.log import get_logger
+from utils.profiling import PROFILE_ID_HEADER, profile_requested, run_profiled
+
+logger = get_logger(__name__)
 
 router = APIRouter(prefix="/documents", tags=["documents"])
 
+# Upload is copied to disk in pieces of this size
+SPOOL_CHUNK_SIZE = 1024 * 1024
+
+
+async def spool_to_disk(file: UploadFile) -> tuple[str, int, str]:
+    """
+    Copy an upload to a temp file without holding it in memory.
+    Returns (path, size_in_bytes, sha256); the caller removes the file.
+    """
+    size = 0
+    digest = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+        while True:
+            piece = await file.read(SPOOL_CHUNK_SIZE)
+            if not piece:
+                break
+            tmp.write(piece)
+            digest.update(piece)
+            size += len(piece)
+    return tmp.name, size, digest.hexdigest()
+
+
+def _namespace_or_400(namespace: Optional[str]) -> str:
+    try:
+        return resolve_namespace(namespace)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 
 @router.post("/upload")
-async def upload_document(file: UploadFile = File(...)):
+async def upload_document(
+    request: Request,
+    response: Response,
+    file: UploadFile = File(...),
+    namespace: Optional[str] = Form(None),
+):
     start = time.time()
-    print(f"🟢 Upload started: {file.filename}")
+    logger.info("🟢 Upload started: %s", file.filename)
 
     if not file.filename.lower().endswith(".pdf"):
         raise HTTPException(status_code=400, detail="Only PDF files are allowed")
 
-    try:
-        # 1️⃣ Read PDF
-        pdf_bytes = await file.read()
-        print(f"📄 Read {len(pdf_bytes)} bytes")
+    namespace = _namespace_or_400(namespace)
 
-        # 2️⃣ Extract text
-        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-        extracted_text = "".join(page.get_text() for page in doc)
-        doc.close()
+    path = None
+    try:
+        # 1️⃣ Spool PDF to disk
+        path, size, content_hash = await spool_to_disk(file)
+        logger.debug("📄 Spooled %s bytes", size)
+
+        # 2️⃣ Extract, chunk, embed and store page by page
+        # (profiled inside the worker thread when X-Profile is sent)
+        result, profile_id = await run_in_threadpool(
+            run_profiled, profile_requested(request), "upload",
+            ingest_pdf, path, file.filename, content_hash, namespace
+        )
+        if profile_id:
+            response.headers[PROFILE_ID_HEADER] = profile_id
 
-        if not extracted_text.strip():
+        if not result["chunks_created"] and not result["skipped"]:
             raise HTTPException(status_code=400, detail="No text found in PDF")
 
-        # 3️⃣ Chunk text
-        chunks = chunk_text(extracted_text, chunk_size=500, overlap=50)
-        if not chunks:
-            raise HTTPException(status_code=400, detail="Failed to create chunks")
-
-        # 4️⃣ Lazy-load embedding model
-        embedding_model = get_embedding_model()
-        embeddings = embedding_model.encode(
-            chunks,
-            batch_size=32,
-            convert_to_numpy=True,
-            normalize_embeddings=True,
-        ).tolist()
-
-        # 5️⃣ Lazy-load vector store
-        vector_store = get_vector_store()
-
-        print("🧹 Clearing ChromaDB collection")
-        vector_store.clear_collection()
-
-        # 6️⃣ Metadata
-        metadatas = [
-            {
-                "filename": file.filename,
-                "chunk_index": i,
-                "total_chunks": len(chunks),
-            }
-            for i in range(len(chunks))
-        ]
-
-        # 7️⃣ Store embeddings
-        print("💾 Storing in ChromaDB...")
-        vector_store.add_text(
-            texts=chunks,
-            embeddings=embeddings,
-            metadatas=metadatas,
-        )
-
-        print(f"🎉 Upload complete in {time.time() - start:.2f}s")
+        logger.info("🎉 Upload complete in %.2fs", time.time() - start)
 
         return {
             "status": "success",
             "filename": file.filename,
-            "chunks_created": len(chunks),
+            "document_id": result["document_id"],
+            "namespace": namespace,
+            "chunks_created": result["chunks_created"],
+            "skipped": result["skipped"],
+            "embedding_cache": result.get("embedding_cache"),
         }
 
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Error: {e}")
+        logger.exception("❌ Error: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if path:
+            os.unlink(path)
+
+
+@router.post("/upload/batch")
+async def upload_documents_batch(
+    files: List[UploadFile] = File(...),
+    namespace: Optional[str] = Form(None),
+):
+    """
+    Upload many PDFs at once. Parsing runs in a process pool and chunks
+    from all files are embedded together; per-file results are returned
+    along with pages/sec for the whole batch.
+    """
+    start = time.time()
+    logger.info("🟢 Batch upload started: %s files", len(files))
+
+    filenames = [f.filename for f in files]
+    if not all(name.lower().endswith(".pdf") for name in filenames):
+        raise HTTPException(status_code=400, detail="Only PDF files are allowed")
+    if len(set(filenames)) != len(filenames):
+        raise HTTPException(status_code=400, detail="Duplicate filenames in batch")
+
+    namespace = _namespace_or_400(namespace)
+
+    spooled = []
+    try:
+        # 1️⃣ Spool every PDF to disk
+        for file in files:
+            path, size, content_hash = await spool_to_disk(file)
+            spooled.append({"path": path, "filename": file.filename, "content_hash": content_hash})
+
+        # 2️⃣ Parse in processes, embed + store across files
+        result = await ingest_pdfs_batch(spooled, namespace)
+
+        logger.info("🎉 Batch upload complete in %.2fs", time.time() - start)
+        return {"status": "success", **result}
+
+    except Exception as e:
+        logger.exception("❌ Error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        for f in spooled:
+            os.unlink(f["path"])
+
+
+@router.get("/namespaces")
+def list_namespaces():
+    return get_vector_store().list_namespaces()
+
+
+@router.get("/")
+def list_documents(namespace: Optional[str] = None):
+    documents = get_vector_store().list_documents(_namespace_or_400(namespace))
+
+    return [
+        {
+            "document_id": d.get("document_id"),
+            "filename": d.get("filename"),
+            "total_chunks": d.get("total_chunks"),
+            "complete": d.get("complete", False),
+        }
+        for d in documents
+    ]
+
+
+@router.delete("/legacy")
+def purge_legacy_chunks(namespace: Optional[str] = None):
+    # Chunks from before document ids (also removed on the namespace's first upload)
+    removed = get_vector_store().purge_legacy_chunks(_namespace_or_400(namespace))
+    return {"message": "Legacy chunks deleted", "chunks_deleted": removed}
+
+
+@router.delete("/{document_id}")
+def delete_document(document_id: str, namespace: Optional[str] = None):
+    namespace = _namespace_or_400(namespace)
+    vector_store = get_vector_store()
+
+    if not vector_store.get_document(document_id, namespace=namespace):
+        raise HTTPException(status_code=404, detail="Not found")
+
+    vector_store.delete_document(document_id, namespace=namespace)
+
+    return {
+        "message": "Document deleted",
+        "document_id": document_id
+    }
@@ -1,18 +1,31 @@
-from fastapi import APIRouter, HTTPException, Depends
+import json
+import os
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from db.session import get_db
+from db.deps import get_async_db
 from typing import List, Dict, Optional
-from services.workflow_executor import execute_workflow
-from core.workflow_registry import get_workflow  
+from core.workflow_compiler import CompiledWorkflow
+from services.workflow_executor import BATCH_CONCURRENCY, check_streamable, execute_batch, execute_workflow, stream_workflow
+from core.workflow_registry import compile_cached, get_workflow_plan, record_execution
+from utils.log import get_logger
+from utils.profiling import PROFILE_ID_HEADER, profile_requested, profiled
+
+logger = get_logger(__name__)
 
 router = APIRouter(prefix="/api/execute", tags=["execute"])
 
 class ExecuteRequest(BaseModel):
-    workflow_id: Optional[str] = None 
+    workflow_id: Optional[str] = None
     query: str
-    nodes: Optional[List[Dict]] = None 
+    nodes: Optional[List[Dict]] = None
     edges: Optional[List[Dict]] = None
 
+class BatchExecuteRequest(BaseModel):
+    workflow_id: str
+    queries: List[str]
+    concurrency: Optional[int] = None
+
 class ExecuteResponse(BaseModel):
     success: bool
     answer: str = None
@@ -21,52 +34,84 @@ class ExecuteResponse(BaseModel):
     metadata: Dict = {}
     error: str = None
 
+
+async def _workflow_plan(workflow_id: str, db) -> CompiledWorkflow:
+    logger.debug("Using workflow_id: %s", workflow_id)
+    try:
+        plan = await get_workflow_plan(workflow_id, db=db)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if not plan:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Workflow {workflow_id} not found"
+        )
+
+    return plan
+
+
+async def _resolve_workflow(request: ExecuteRequest, db) -> CompiledWorkflow:
+    """
+    Compiled plan for workflow_id, or for the nodes/edges provided (legacy)
+    """
+    if request.workflow_id:
+        return await _workflow_plan(request.workflow_id, db)
+
+    if request.nodes and request.edges:
+        logger.debug("Using provided nodes/edges (legacy mode)")
+        try:
+            return compile_cached(request.nodes, request.edges)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    raise HTTPException(
+        status_code=400,
+        detail="Must provide either workflow_id or nodes+edges"
+    )
+
+
 @router.post("", response_model=ExecuteResponse)
-async def execute(request: ExecuteRequest, db=Depends(get_db)):
+async def execute(
+    request: ExecuteRequest,
+    background_tasks: BackgroundTasks,
+    http_request: Request,
+    response: Response,
+    db=Depends(get_async_db),
+):
     """
     Execute workflow with query
-    
+
     Can accept either:
     - workflow_id + query (preferred)
     - nodes + edges + query (legacy)
+
+    With PROFILING_ENABLED, `X-Profile: 1` (or ?profile=1) runs this
+    execution under the sampling profiler; the stored profile's id comes
+    back in X-Profile-Id (GET /api/profiles/{id}).
     """
-    
+
     try:
-        print(f"\n🔵 Execute API called")
-        print(f"Query: {request.query}")
-        
-        # Get workflow from ID or use provided nodes/edges
-        if request.workflow_id:
-            print(f"Using workflow_id: {request.workflow_id}")
-            workflow = get_workflow(request.workflow_id, db=db)
-            
-            if not workflow:
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"Workflow {request.workflow_id} not found"
-                )
-            
-            nodes = workflow["nodes"]
-            edges = workflow["edges"]
-            
-        elif request.nodes and request.edges:
-            print(f"Using provided nodes/edges (legacy mode)")
-            nodes = request.nodes
-            edges = request.edges
-            
-        else:
-            raise HTTPException(
-                status_code=400,
-                detail="Must provide either workflow_id or nodes+edges"
-            )
-        
+        logger.info("🔵 Execute API called")
+        logger.debug("Query: %s", request.query)
+
+        plan = await _resolve_workflow(request, db)
+
         # Execute workflow
-        result = await execute_workflow(
-            query=request.query,
-            nodes=nodes,
-            edges=edges
-        )
-        
+        profiling = profile_requested(http_request)
+        with profiled(profiling, "execute") as profile:
+            # A profiled run must do the work itself, not join one in flight
+            result = await execute_workflow(
+                query=request.query,
+                workflow_id=request.workflow_id,
+                plan=plan,
+                coalesce=not profiling,
+            )
+        if profile.profile_id:
+            response.headers[PROFILE_ID_HEADER] = profile.profile_id
+        if request.workflow_id:
+            background_tasks.add_task(record_execution, request.workflow_id)
+
         return ExecuteResponse(
             success=True,
             answer=result["answer"],
@@ -78,9 +123,104 @@ async def execute(request: ExecuteRequest, db=Depends(get_db)):
         raise e
 
     except ValueError as e:
-        print(f"❌ Validation error: {e}")
+        logger.warning("⚠️ Validation error: %s", e)
         raise HTTPException(status_code=400, detail=str(e))
-        
+
     except Exception as e:
-        print(f"❌ Execution error: {e}")
-        raise HTTPException(status_code=500, detail="Execution failed")
\ No newline at end of file
+        logger.exception("❌ Execution error: %s", e)
+        raise HTTPException(status_code=500, detail="Execution failed")
+
+
+def _sse(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/stream")
+async def execute_stream(request: ExecuteRequest, background_tasks: BackgroundTasks, db=Depends(get_async_db)):
+    """
+    Execute workflow and stream the result as Server-Sent Events:
+    `sources` first, then `token` events, then `metadata` (or `error`)
+    """
+    logger.info("🔵 Execute stream API called")
+    logger.debug("Query: %s", request.query)
+
+    plan = await _resolve_workflow(request, db)
+    # Reject before the 200 / event stream starts
+    try:
+        check_streamable(plan)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if request.workflow_id:
+        background_tasks.add_task(record_execution, request.workflow_id)
+
+    async def events():
+        try:
+            async for item in stream_workflow(
+                query=request.query,
+                workflow_id=request.workflow_id,
+                plan=plan,
+            ):
+                event = item.pop("event")
+                yield _sse(event, item)
+
+        except ValueError as e:
+            logger.warning("⚠️ Validation error: %s", e)
+            yield _sse("error", {"error": str(e)})
+
+        except Exception as e:
+            logger.exception("❌ Execution error: %s", e)
+            yield _sse("error", {"error": "Execution failed"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=background_tasks,
+    )
+
+
+# Upper bound on queries accepted by one batch request
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", "10000"))
+
+
+@router.post("/batch")
+async def execute_batch_endpoint(request: BatchExecuteRequest, background_tasks: BackgroundTasks, db=Depends(get_async_db)):
+    """
+    Run many queries against one workflow and stream results as NDJSON,
+    one line per query in completion order:
+    {"index", "query", "success", "answer", "sources", "has_context", "metadata"}
+    or {"index", "query", "success": false, "error"}
+    """
+    logger.info("🔵 Execute batch API called (%s queries)", len(request.queries))
+
+    if not request.queries:
+        raise HTTPException(status_code=400, detail="queries must not be empty")
+    if len(request.queries) > BATCH_MAX_QUERIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {BATCH_MAX_QUERIES} queries per batch"
+        )
+
+    plan = await _workflow_plan(request.workflow_id, db)
+    background_tasks.add_task(record_execution, request.workflow_id)
+
+    async def lines():
+        try:
+            async for item in execute_batch(
+                queries=request.queries,
+                plan=plan,
+                workflow_id=request.workflow_id,
+                concurrency=request.concurrency or BATCH_CONCURRENCY,
+            ):
+                yield json.dumps(item) + "\n"
+
+        except Exception as e:
+            logger.exception("❌ Batch execution error: %s", e)
+            yield json.dumps({"success": False, "error": "Batch execution failed"}) + "\n"
+
+    return StreamingResponse(
+        lines(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=background_tasks,
+    )
@@ -0,0 +1,16 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse
+from utils.profiling import PROFILING_ENABLED, profile_path
+
+router = APIRouter(prefix="/api/profiles", tags=["profiles"])
+
+
+@router.get("/{profile_id}")
+def get_profile(profile_id: str):
+    """
+    pyinstrument HTML profile stored by a request sent with X-Profile
+    """
+    path = profile_path(profile_id) if PROFILING_ENABLED else None
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/html")
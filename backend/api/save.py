@@ -1,6 +1,9 @@
 from fastapi import APIRouter
 from pydantic import BaseModel
 from services.vector_store_service import get_vector_store
+from utils.log import get_logger
+
+logger = get_logger(__name__)
 
 vector_store = get_vector_store()
 from services.embedding_service import EmbeddingService
@@ -24,7 +27,7 @@ def chat(req: ChatRequest):
     )
 
     if not results:
-        print("❌ Knowledge base empty or failed")
+        logger.error("❌ Knowledge base empty or failed")
         context = None
     else:
         context = "\n".join(r["text"] for r in results)
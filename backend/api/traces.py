@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta, timezone
+from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import Depends
+from db.deps import get_async_db
+from db.models.execution_trace import ExecutionTrace
+from services.trace_service import get_trace_writer
+
+router = APIRouter(prefix="/api/traces", tags=["traces"])
+
+SLOWEST_DEFAULT_LIMIT = 20
+SLOWEST_MAX_LIMIT = 200
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+@router.get("/slowest")
+async def slowest_runs(
+    workflow_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    hours: float = Query(24, gt=0, description="Window length when `since` is not given"),
+    mode: Optional[str] = Query(None, description="execute | stream | batch"),
+    limit: int = Query(SLOWEST_DEFAULT_LIMIT, ge=1, le=SLOWEST_MAX_LIMIT),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Slowest executions (by total_ms) in a time window, optionally for one
+    workflow, with their node-by-node durations, sizes and cache outcomes.
+    """
+    # Naive timestamps are taken as UTC (created_at is stored timezone-aware)
+    until = _as_utc(until) if until else datetime.now(timezone.utc)
+    since = _as_utc(since) if since else until - timedelta(hours=hours)
+    if since >= until:
+        raise HTTPException(status_code=400, detail="`since` must be before `until`")
+
+    # Include runs still waiting in the write buffer
+    await get_trace_writer().flush()
+
+    filters = [ExecutionTrace.created_at >= since, ExecutionTrace.created_at < until]
+    if workflow_id:
+        filters.append(ExecutionTrace.workflow_id == workflow_id)
+    if mode:
+        filters.append(ExecutionTrace.mode == mode)
+
+    rows = (await db.execute(
+        select(ExecutionTrace)
+        .where(*filters)
+        .order_by(ExecutionTrace.total_ms.desc())
+        .limit(limit)
+    )).scalars().all()
+
+    return [
+        {
+            "workflow_id": t.workflow_id,
+            "mode": t.mode,
+            "total_ms": t.total_ms,
+            "success": t.success,
+            "error": t.error,
+            "chunks_used": t.chunks_used,
+            "prompt_chars": t.prompt_chars,
+            "answer_chars": t.answer_chars,
+            "cache_hit": t.cache_hit,
+            "nodes": t.nodes,
+            "created_at": t.created_at,
+        }
+        for t in rows
+    ]
@@ -1,15 +1,24 @@
-from fastapi import APIRouter, HTTPException
+import base64
+import json
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Query, Response
 from pydantic import BaseModel
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 from core.workflow_validator import validate_workflow
-from core.workflow_registry import create_workflow, get_workflow 
-from sqlalchemy.orm import Session
+from core.workflow_compiler import content_hash
+from core.workflow_registry import create_workflow, find_workflow_by_hash, get_workflow, save_workflow as save_to_registry
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends
-from db.deps import get_db
+from db.deps import get_async_db
 from db.models.workflow import Workflow
 
 router = APIRouter(prefix="/api/workflows", tags=["workflows"])
 
+# Page size for GET /api/workflows/
+LIST_DEFAULT_LIMIT = 100
+LIST_MAX_LIMIT = 500
+
 class BuildRequest(BaseModel):
     nodes: List[Dict]
     edges: List[Dict]
@@ -26,11 +35,16 @@ class SaveWorkflowRequest(BaseModel):
 
 # NEW: Build endpoint
 @router.post("/build", response_model=BuildResponse)
-def build(request: BuildRequest):
+async def build(request: BuildRequest, db: AsyncSession = Depends(get_async_db)):
     """
     Validate and store workflow, return workflow_id
     """
-    
+
+    # Identical graph already built and not saved yet: reuse it (and its compiled plan)
+    existing = await find_workflow_by_hash(content_hash(request.nodes, request.edges), db=db)
+    if existing:
+        return BuildResponse(workflow_id=existing, status="ready")
+
     # Validate first
     validation = validate_workflow(request.nodes, request.edges)
     
@@ -44,7 +58,7 @@ def build(request: BuildRequest):
         )
     
     # Store workflow
-    workflow_id = create_workflow(request.nodes, request.edges)
+    workflow_id = await create_workflow(request.nodes, request.edges, db=db)
     
     return BuildResponse(
         workflow_id=workflow_id,
@@ -52,33 +66,21 @@ def build(request: BuildRequest):
     )
 
 @router.post("/save")
-def save_workflow(
+async def save_workflow(
     request: SaveWorkflowRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    # Check if workflow already saved
-    existing = (
-        db.query(Workflow)
-        .filter(Workflow.workflow_id == request.workflow_id)
-        .first()
-    )
-
-    if existing:
-        raise HTTPException(
-            status_code=400,
-            detail="Workflow already saved"
+    # /build already stored the graph: name it and save the latest version
+    try:
+        await save_to_registry(
+            workflow_id=request.workflow_id,
+            name=request.name,
+            nodes=request.nodes,
+            edges=request.edges,
+            db=db,
         )
-
-    workflow = Workflow(
-        workflow_id=request.workflow_id,
-        name=request.name,
-        nodes=request.nodes,
-        edges=request.edges,
-    )
-
-    db.add(workflow)
-    db.commit()
-    db.refresh(workflow)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     return {
         "message": "Workflow saved successfully",
@@ -86,10 +88,10 @@ def save_workflow(
     }
 
 @router.get("/{workflow_id}")
-def get_workflow(workflow_id: str, db: Session = Depends(get_db)):
-    wf = db.query(Workflow).filter(
-        Workflow.workflow_id == workflow_id
-    ).first()
+async def get_workflow(workflow_id: str, db: AsyncSession = Depends(get_async_db)):
+    wf = (await db.execute(
+        select(Workflow).where(Workflow.workflow_id == workflow_id)
+    )).scalars().first()
 
     if not wf:
         raise HTTPException(status_code=404, detail="Not found")
@@ -101,14 +103,67 @@ def get_workflow(workflow_id: str, db: Session = Depends(get_db)):
         "edges": wf.edges
     }
 
+def _encode_cursor(created_at: datetime, row_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), row_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @router.get("/")
-def list_workflows(db: Session = Depends(get_db)):
-    workflows = db.query(Workflow).all()
+async def list_workflows(
+    response: Response,
+    limit: int = Query(LIST_DEFAULT_LIMIT, ge=1, le=LIST_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    q: Optional[str] = Query(None, description="Name prefix"),
+    include_total: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    List saved workflows, oldest first, a page at a time.
+
+    The body keeps its original shape ([{workflow_id, name}]); the next
+    page's cursor is returned in the X-Next-Cursor header and, with
+    include_total, the number of matches in X-Total-Count.
+    """
+    # Rows /build stored but nobody saved don't belong in the list
+    filters = [Workflow.saved.is_(True)]
+    if q:
+        # Prefix match so the name index can be used
+        filters.append(Workflow.name.startswith(q, autoescape=True))
+
+    # Only the listed columns: nodes/edges JSON is never loaded here
+    stmt = (
+        select(Workflow.id, Workflow.workflow_id, Workflow.name, Workflow.created_at)
+        .where(*filters)
+        .order_by(Workflow.created_at, Workflow.id)
+        .limit(limit + 1)
+    )
+    if cursor:
+        created_at, row_id = _decode_cursor(cursor)
+        stmt = stmt.where(or_(
+            Workflow.created_at > created_at,
+            and_(Workflow.created_at == created_at, Workflow.id > row_id),
+        ))
+
+    rows = (await db.execute(stmt)).all()
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = _encode_cursor(rows[-1].created_at, rows[-1].id)
+
+    if include_total:
+        total = await db.scalar(select(func.count(Workflow.id)).where(*filters))
+        response.headers["X-Total-Count"] = str(total)
 
     return [
         {
             "workflow_id": wf.workflow_id,
             "name": wf.name,
         }
-        for wf in workflows
-    ]
+        for wf in rows
+    ]
\ No newline at end of file
@@ -0,0 +1,109 @@
+"""
+PDF ingestion throughput (pages/sec): sequential parsing vs. the process
+pool used by POST /documents/upload/batch, and optionally the full batch
+pipeline (parse + cross-file embedding + Chroma upsert).
+
+Run from backend/ (synthetic PDFs are generated when no paths are given):
+    python -m benchmarks.batch_ingestion --files 32 --pages 40
+    python -m benchmarks.batch_ingestion manuals/*.pdf --processes 1,2,4,8 --full
+"""
+import argparse
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from services.pdf_worker import init_worker, parse_pdf
+from benchmarks.chunking import synthetic_pages
+
+MAX_TOKENS = 200
+OVERLAP_TOKENS = 30
+
+
+def make_pdfs(directory: str, n_files: int, n_pages: int) -> list[str]:
+    import fitz
+
+    paths = []
+    pages = synthetic_pages(n_pages)
+    for i in range(n_files):
+        doc = fitz.open()
+        for text in pages:
+            doc.new_page().insert_textbox(fitz.Rect(50, 50, 550, 800), text, fontsize=9)
+        path = os.path.join(directory, f"synthetic_{i}.pdf")
+        doc.save(path)
+        doc.close()
+        paths.append(path)
+    return paths
+
+
+def parse_sequential(paths: list[str]) -> int:
+    init_worker()
+    return sum(parse_pdf(p, MAX_TOKENS, OVERLAP_TOKENS)[1] for p in paths)
+
+
+def parse_pool(paths: list[str], processes: int) -> tuple[int, float]:
+    with ProcessPoolExecutor(
+        max_workers=processes,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker,
+    ) as pool:
+        # Warm the workers (tokenizer load) outside the timed region
+        list(pool.map(init_worker_noop, range(processes)))
+        start = time.perf_counter()
+        pages = sum(n for _, n in pool.map(parse_pdf, paths, [MAX_TOKENS] * len(paths), [OVERLAP_TOKENS] * len(paths)))
+        return pages, time.perf_counter() - start
+
+
+def init_worker_noop(_):
+    return None
+
+
+async def full_pipeline(paths: list[str]) -> dict:
+    from services.ingestion_service import ingest_pdfs_batch
+
+    files = []
+    for path in paths:
+        with open(path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        files.append({"path": path, "filename": os.path.basename(path), "content_hash": digest})
+    return await ingest_pdfs_batch(files, namespace="bench")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("pdfs", nargs="*")
+    parser.add_argument("--files", type=int, default=16)
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--processes", default=",".join(
+        str(n) for n in sorted({1, 2, 4, os.cpu_count() or 1})
+    ))
+    parser.add_argument("--full", action="store_true", help="also run parse + embed + store")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = args.pdfs or make_pdfs(tmp, args.files, args.pages)
+        print(f"files={len(paths)} cpus={os.cpu_count()}")
+        print(f"{'mode':<16} {'pages':>8} {'seconds':>9} {'pages/sec':>10}")
+
+        start = time.perf_counter()
+        pages = parse_sequential(paths)
+        elapsed = time.perf_counter() - start
+        print(f"{'sequential':<16} {pages:>8} {elapsed:>9.2f} {pages / elapsed:>10.1f}")
+
+        for n in (int(p) for p in args.processes.split(",")):
+            pages, elapsed = parse_pool(paths, n)
+            print(f"{f'pool x{n}':<16} {pages:>8} {elapsed:>9.2f} {pages / elapsed:>10.1f}")
+
+        if args.full:
+            os.environ.setdefault("CHROMA_PERSIST_DIR", os.path.join(tmp, "chroma"))
+            os.environ.setdefault("EMBEDDING_CACHE_PATH", os.path.join(tmp, "cache.sqlite"))
+            result = asyncio.run(full_pipeline(paths))
+            print(f"{'full pipeline':<16} {result['pages']:>8} {result['seconds']:>9.2f} "
+                  f"{result['pages_per_sec']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Character-window chunk_text vs. the structure/token-aware iter_chunks.
+
+Reports chunks/sec, chunk count and the resulting index size (chunk text +
+384-dim float32 vectors) for a PDF, or for synthetic text if none is given.
+
+Run from backend/:
+    python -m benchmarks.chunking path/to/manual.pdf
+    python -m benchmarks.chunking --tokenizer   # measure with the real model tokenizer
+"""
+import argparse
+import random
+import time
+
+from utils.chunking import chunk_text, estimate_token_spans, iter_chunks
+
+VECTOR_BYTES = 384 * 4
+
+
+def synthetic_pages(n_pages: int = 200) -> list[str]:
+    rng = random.Random(0)
+    words = ("pump valve pressure sensor error code reset controller manual "
+             "warning install replace filter E1042 P-778 calibrate flow rate").split()
+    pages = []
+    for _ in range(n_pages):
+        paragraphs = []
+        for _ in range(rng.randint(3, 7)):
+            sentences = [
+                " ".join(rng.choice(words) for _ in range(rng.randint(6, 24))).capitalize() + "."
+                for _ in range(rng.randint(2, 6))
+            ]
+            paragraphs.append("\n".join(sentences))
+        pages.append("\n\n".join(paragraphs))
+    return pages
+
+
+def report(name: str, chunks: list[str], elapsed: float):
+    text_bytes = sum(len(c.encode("utf-8")) for c in chunks)
+    index_bytes = text_bytes + len(chunks) * VECTOR_BYTES
+    print(f"{name:<12} {len(chunks):>8} {len(chunks) / elapsed:>12.0f} "
+          f"{text_bytes / 1e6:>10.2f} {index_bytes / 1e6:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("pdf", nargs="?")
+    parser.add_argument("--tokenizer", action="store_true")
+    args = parser.parse_args()
+
+    if args.pdf:
+        from services.ingestion_service import iter_pdf_pages
+        pages = list(iter_pdf_pages(args.pdf))
+    else:
+        pages = synthetic_pages()
+
+    spans = estimate_token_spans
+    if args.tokenizer:
+        from services.embedding_service import token_spans
+        spans = token_spans
+
+    print(f"pages={len(pages)} chars={sum(map(len, pages))}")
+    print(f"{'chunker':<12} {'chunks':>8} {'chunks/sec':>12} {'text MB':>10} {'index MB':>10}")
+
+    start = time.perf_counter()
+    old = chunk_text("".join(pages), chunk_size=500, overlap=50)
+    report("chunk_text", old, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    new = [c for c, _ in iter_chunks(pages, token_spans=spans)]
+    report("iter_chunks", new, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
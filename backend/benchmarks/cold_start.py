@@ -0,0 +1,67 @@
+"""
+Cold start: time to `import main`, heavy modules loaded by the import,
+and latency of the first requests that need the model / Chroma — with and
+without the background prewarm (STARTUP_PREWARM).
+
+Each mode runs in a fresh interpreter so nothing is already imported.
+
+Run from backend/:
+    python -m benchmarks.cold_start
+"""
+import json
+import os
+import subprocess
+import sys
+
+HEAVY_MODULES = ["sentence_transformers", "torch", "chromadb", "google.genai", "fitz"]
+
+PROBE = r"""
+import json, sys, time
+t0 = time.perf_counter()
+import main
+import_s = time.perf_counter() - t0
+loaded = [m for m in HEAVY if m in sys.modules]
+
+from fastapi.testclient import TestClient
+
+out = {"import_s": import_s, "heavy_loaded_by_import": loaded}
+with TestClient(main.app) as client:
+    if PREWARM:
+        t = time.perf_counter()
+        while client.get("/ready").status_code != 200 and time.perf_counter() - t < 300:
+            time.sleep(0.1)
+        out["ready_s"] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    client.get("/documents/")
+    out["first_chroma_request_s"] = time.perf_counter() - t
+
+    from services.embedding_service import EmbeddingService
+    t = time.perf_counter()
+    EmbeddingService().embed_query("first query after start")
+    out["first_query_embed_s"] = time.perf_counter() - t
+
+print("RESULT " + json.dumps(out))
+"""
+
+
+def run(prewarm: bool) -> dict:
+    env = {**os.environ, "STARTUP_PREWARM": "true" if prewarm else "false"}
+    code = f"HEAVY = {HEAVY_MODULES!r}\nPREWARM = {prewarm}\n" + PROBE
+    proc = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True)
+    for line in proc.stdout.splitlines():
+        if line.startswith("RESULT "):
+            return json.loads(line[len("RESULT "):])
+    raise RuntimeError(proc.stderr[-2000:])
+
+
+def main():
+    for prewarm in (False, True):
+        result = run(prewarm)
+        print(f"\nSTARTUP_PREWARM={prewarm}")
+        for key, value in result.items():
+            print(f"  {key:<24} {value if isinstance(value, list) else f'{value:.3f}s'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Embedding backends compared against the current torch model: batch encode
+throughput, single-query latency (p50/p99) and cosine agreement of the
+vectors (1.0 = identical to what is already stored in Chroma).
+
+Run from backend/:
+    python -m benchmarks.embedding_backends --backends torch,onnx,onnx-int8
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from benchmarks.chunking import synthetic_pages
+from services.embedding_service import EMBEDDING_BACKENDS, load_embedding_model
+from utils.chunking import iter_chunks
+
+
+def encode(model, texts, batch_size):
+    return model.encode(texts, batch_size=batch_size, convert_to_numpy=True, normalize_embeddings=True)
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backends", default=",".join(EMBEDDING_BACKENDS))
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    texts = [c for c, _ in iter_chunks(synthetic_pages(400))][:args.chunks]
+    queries = [t[:80] for t in texts[:args.queries]]
+    print(f"chunks={len(texts)} queries={len(queries)} batch_size={args.batch_size}")
+
+    reference = None
+    print(f"{'backend':<10} {'load s':>7} {'chunks/s':>9} {'p50 ms':>7} {'p99 ms':>7} "
+          f"{'cos mean':>9} {'cos min':>8}")
+
+    for backend in ["torch"] + [b for b in args.backends.split(",") if b != "torch"]:
+        start = time.perf_counter()
+        model = load_embedding_model(backend)
+        load_s = time.perf_counter() - start
+
+        encode(model, texts[:args.batch_size], args.batch_size)  # warm-up
+
+        start = time.perf_counter()
+        vectors = encode(model, texts, args.batch_size)
+        throughput = len(texts) / (time.perf_counter() - start)
+
+        latencies = []
+        for q in queries:
+            start = time.perf_counter()
+            encode(model, q, 1)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        if reference is None:
+            reference = vectors
+        # Rows are unit-normalised, so the row-wise dot product is the cosine
+        cosine = np.sum(vectors * reference, axis=1)
+
+        print(f"{backend:<10} {load_s:>7.1f} {throughput:>9.0f} {statistics.median(latencies):>7.2f} "
+              f"{percentile(latencies, 99):>7.2f} {cosine.mean():>9.5f} {cosine.min():>8.5f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Throughput of concurrent query embeddings: one encode per call vs. the
+micro-batching EmbeddingBatcher.
+
+Run from backend/:
+    python -m benchmarks.embedding_batcher --requests 512
+
+Prints queries/s at 1, 8 and 64 concurrent callers for both paths. No
+numbers are recorded here yet: the change adding the batcher was written
+without torch / sentence-transformers available, so run this on the
+serving hardware before relying on EMBED_MAX_BATCH / EMBED_MAX_WAIT_MS.
+"""
+import argparse
+import asyncio
+import time
+
+from services.embedding_service import (
+    EmbeddingBatcher,
+    EMBED_MAX_BATCH,
+    EMBED_MAX_WAIT_MS,
+    encode_queries,
+    get_embedding_model,
+)
+
+
+async def unbatched(texts, concurrency):
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(text):
+        async with sem:
+            return await asyncio.to_thread(encode_queries, [text])
+
+    await asyncio.gather(*(one(t) for t in texts))
+
+
+async def batched(texts, concurrency, batcher):
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(text):
+        async with sem:
+            return await batcher.embed(text)
+
+    await asyncio.gather(*(one(t) for t in texts))
+
+
+async def run(total: int):
+    get_embedding_model()  # load outside the timed region
+    texts = [f"how do I reset error code E{i:04d} on the pump controller?" for i in range(total)]
+    batcher = EmbeddingBatcher(EMBED_MAX_BATCH, EMBED_MAX_WAIT_MS)
+
+    print(f"requests={total} max_batch={EMBED_MAX_BATCH} max_wait_ms={EMBED_MAX_WAIT_MS}")
+    print(f"{'callers':>8} {'unbatched q/s':>14} {'batched q/s':>12}")
+
+    for concurrency in (1, 8, 64):
+        start = time.perf_counter()
+        await unbatched(texts, concurrency)
+        plain = total / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await batched(texts, concurrency, batcher)
+        fast = total / (time.perf_counter() - start)
+
+        print(f"{concurrency:>8} {plain:>14.1f} {fast:>12.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=512)
+    args = parser.parse_args()
+
+    asyncio.run(run(args.requests))
@@ -0,0 +1,68 @@
+"""
+Load test: do concurrent workflow executions overlap?
+
+Swaps the Gemini client for a fake one that sleeps for a fixed latency, then
+fires N executions at once. With a blocking LLM call the wall time is about
+N x latency; with the async path it should stay close to a single latency
+(bounded by LLM_MAX_CONCURRENCY).
+
+Run from backend/:
+    python -m benchmarks.execute_concurrency --concurrency 32 --latency 0.5
+"""
+import argparse
+import asyncio
+import time
+from types import SimpleNamespace
+
+from services import llm_service
+from services.workflow_executor import execute_workflow
+
+NODES = [
+    {"id": "q", "type": "userQuery", "data": {}},
+    {"id": "llm", "type": "llmEngine", "data": {"model": "fake"}},
+    {"id": "out", "type": "output", "data": {}},
+]
+EDGES = [
+    {"source": "q", "target": "llm"},
+    {"source": "llm", "target": "out"},
+]
+
+
+class _FakeModels:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def generate_content(self, model, contents):
+        await asyncio.sleep(self.latency)
+        return SimpleNamespace(text="ok")
+
+
+class FakeClient:
+    def __init__(self, latency: float):
+        self.aio = SimpleNamespace(models=_FakeModels(latency))
+
+
+async def run(concurrency: int, latency: float):
+    llm_service._client = FakeClient(latency)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        execute_workflow(query=f"question {i}", nodes=NODES, edges=EDGES)
+        for i in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - start
+
+    serial = concurrency * latency
+    print(f"concurrency={concurrency} latency={latency:.2f}s")
+    print(f"  wall time:      {elapsed:.2f}s")
+    print(f"  serialised est: {serial:.2f}s")
+    print(f"  overlap factor: {serial / elapsed:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    asyncio.run(run(args.concurrency, args.latency))
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Tests import app modules the way main.py does (utils.*, services.*), so put
+# backend/ on the path: the suite then also runs from the repository root
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
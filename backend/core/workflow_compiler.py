@@ -0,0 +1,162 @@
+import hashlib
+import json
+from collections import defaultdict
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Dict, FrozenSet, List, Mapping, Tuple
+
+from core.workflow_validator import topological_sort
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def content_hash(nodes: List[Dict], edges: List[Dict]) -> str:
+    """
+    Hash of what the executor actually uses: node ids/types/config and the
+    edge endpoints. Canvas-only fields (positions, selection) are ignored,
+    so moving a node around doesn't produce a new workflow.
+    """
+    canonical = {
+        "nodes": sorted(
+            ({"id": n.get("id"), "type": n.get("type"), "data": n.get("data", {})} for n in nodes),
+            key=lambda n: str(n["id"]),
+        ),
+        "edges": sorted(
+            (str(e.get("source")), str(e.get("target"))) for e in edges
+        ),
+    }
+    payload = json.dumps(canonical, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass(frozen=True)
+class CompiledWorkflow:
+    """
+    Immutable, slot-based execution plan. Every node gets a slot index;
+    all per-node data is stored in tuples indexed by slot.
+    """
+    content_hash: str
+    node_ids: Tuple[str, ...]
+    node_types: Tuple[str, ...]
+    nodes: Tuple[Mapping, ...]                  # read-only {"id", "type", "data"}
+    predecessors: Tuple[Tuple[int, ...], ...]
+    successors: Tuple[Tuple[int, ...], ...]
+    ancestors: Tuple[FrozenSet[int], ...]
+    order: Tuple[int, ...]                      # topological order of slots
+    output_slot: int                            # output whose answer is returned
+    answer_llm_slot: int                        # LLM that produces that answer
+    answer_llm_slots: Tuple[int, ...]           # all LLMs joined into it (usually one)
+
+    def slots_of_type(self, node_type: str) -> Tuple[int, ...]:
+        return tuple(s for s in self.order if self.node_types[s] == node_type)
+
+
+def _default_edges(nodes: List[Dict]) -> List[Dict]:
+    """
+    Legacy requests may send nodes without edges: wire the classic
+    User Query -> (Knowledge Base) -> LLM -> Output chain.
+    """
+    chain = []
+    for node_type in ("userQuery", "knowledgeBase", "llmEngine", "output"):
+        node = next((n for n in nodes if n.get("type") == node_type), None)
+        if node:
+            chain.append(node)
+    return [
+        {"source": a["id"], "target": b["id"]}
+        for a, b in zip(chain, chain[1:])
+    ]
+
+
+def _answering_llms(output_slot: int, predecessors, node_types) -> set:
+    """
+    LLM slots whose answers reach the output without passing through
+    another LLM (an upstream LLM's answer only becomes context)
+    """
+    found, seen, stack = set(), {output_slot}, [output_slot]
+    while stack:
+        for p in predecessors[stack.pop()]:
+            if p in seen:
+                continue
+            seen.add(p)
+            if node_types[p] == "llmEngine":
+                found.add(p)
+            else:
+                stack.append(p)
+    return found
+
+
+def compile_workflow(nodes: List[Dict], edges: List[Dict]) -> CompiledWorkflow:
+    types_present = {n.get("type") for n in nodes}
+    if "userQuery" not in types_present:
+        raise ValueError("User Query component not found")
+    if "llmEngine" not in types_present:
+        raise ValueError("LLM Engine component not found")
+    if "output" not in types_present:
+        raise ValueError("Output component not found")
+
+    digest = content_hash(nodes, edges)
+    if not edges:
+        edges = _default_edges(nodes)
+
+    node_ids = tuple(dict.fromkeys(n["id"] for n in nodes))
+    slot = {node_id: i for i, node_id in enumerate(node_ids)}
+    by_id = {n["id"]: n for n in nodes}
+
+    graph = defaultdict(list)
+    preds = defaultdict(list)
+    # A repeated edge would feed the same output into a node twice
+    seen_edges = set()
+    for e in edges:
+        source, target = e.get("source"), e.get("target")
+        if source not in slot or target not in slot:
+            raise ValueError(f"Edge {source} -> {target} references an unknown node")
+        if (source, target) in seen_edges:
+            continue
+        seen_edges.add((source, target))
+        graph[source].append(target)
+        preds[target].append(source)
+
+    order_ids = topological_sort(list(node_ids), graph)
+    if len(order_ids) != len(node_ids):
+        raise ValueError("Workflow contains a cycle (circular dependency)")
+    order = tuple(slot[n] for n in order_ids)
+
+    predecessors = tuple(tuple(slot[p] for p in preds[n]) for n in node_ids)
+    successors = tuple(tuple(slot[s] for s in graph[n]) for n in node_ids)
+
+    # Topological order means every predecessor's ancestor set is ready first
+    ancestors: List[FrozenSet[int]] = [frozenset()] * len(node_ids)
+    for s in order:
+        acc = set(predecessors[s])
+        for p in predecessors[s]:
+            acc |= ancestors[p]
+        ancestors[s] = frozenset(acc)
+
+    node_types = tuple(by_id[n].get("type") for n in node_ids)
+    output_slot = next(s for s in order if node_types[s] == "output")
+    llm_slots = [s for s in order if node_types[s] == "llmEngine"]
+    feeding = [s for s in llm_slots if s in ancestors[output_slot]] or llm_slots
+    answering = _answering_llms(output_slot, predecessors, node_types)
+
+    return CompiledWorkflow(
+        content_hash=digest,
+        node_ids=node_ids,
+        node_types=node_types,
+        nodes=tuple(
+            _freeze({"id": n, "type": by_id[n].get("type"), "data": by_id[n].get("data") or {}})
+            for n in node_ids
+        ),
+        predecessors=predecessors,
+        successors=successors,
+        ancestors=tuple(ancestors),
+        order=order,
+        output_slot=output_slot,
+        answer_llm_slot=feeding[-1],
+        answer_llm_slots=tuple(s for s in order if s in answering) or (feeding[-1],),
+    )
@@ -1,24 +1,187 @@
+from collections import defaultdict
 from typing import Dict, Optional
+import os
+import threading
+import time
 import uuid
 
+from sqlalchemy import select, update
+
+from core.workflow_compiler import CompiledWorkflow, compile_workflow, content_hash
+from utils.cache import TTLCache
+from utils.log import get_logger
+
+logger = get_logger(__name__)
+
+# Hot workflows kept in memory; the workflows table is the source of truth
+WORKFLOW_CACHE_SIZE = int(os.getenv("WORKFLOW_CACHE_SIZE", "512"))
+WORKFLOW_CACHE_TTL = float(os.getenv("WORKFLOW_CACHE_TTL", "3600"))
+# Number of most-executed workflows loaded at startup (0 = off)
+WORKFLOW_PRELOAD = int(os.getenv("WORKFLOW_PRELOAD", "0"))
+# Execution counts are batched and written at most this often
+WORKFLOW_STATS_FLUSH_SECONDS = float(os.getenv("WORKFLOW_STATS_FLUSH_SECONDS", "30"))
+
+DEFAULT_WORKFLOW_NAME = "Untitled workflow"
+
 # In-memory storage for workflows
-WORKFLOWS: Dict[str, dict] = {}
+WORKFLOWS = TTLCache(maxsize=WORKFLOW_CACHE_SIZE, ttl=WORKFLOW_CACHE_TTL)
+
+# Compiled execution plans by graph content hash, and the unsaved workflow
+# /build stored for each (saved workflows are never handed out by /build)
+PLANS = TTLCache(maxsize=WORKFLOW_CACHE_SIZE)
+WORKFLOW_BY_HASH = TTLCache(maxsize=WORKFLOW_CACHE_SIZE, ttl=WORKFLOW_CACHE_TTL)
+
+_execution_counts: Dict[str, int] = defaultdict(int)
+_stats_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+
+def _session():
+    from db.session import get_async_sessionmaker
+    return get_async_sessionmaker()()
 
-def create_workflow(nodes: list, edges: list) -> str:
+
+def _row_to_workflow(row) -> dict:
+    return {
+        "nodes": row.nodes,
+        "edges": row.edges,
+        "content_hash": row.content_hash or content_hash(row.nodes, row.edges),
+        "saved": bool(row.saved),
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+    }
+
+
+def _remember(workflow_id: str, workflow: dict):
+    WORKFLOWS.set(workflow_id, workflow)
+    if not workflow.get("saved"):
+        WORKFLOW_BY_HASH.set(workflow["content_hash"], workflow_id)
+    elif WORKFLOW_BY_HASH.get(workflow["content_hash"]) == workflow_id:
+        WORKFLOW_BY_HASH.pop(workflow["content_hash"])
+
+
+def compile_cached(nodes: list, edges: list, digest: Optional[str] = None) -> CompiledWorkflow:
     """
-    Store workflow and return workflow_id
+    Compiled plan for a graph, compiling only the first time it is seen
     """
+    digest = digest or content_hash(nodes, edges)
+    plan = PLANS.get(digest)
+    if plan is None:
+        plan = compile_workflow(nodes, edges)
+        PLANS.set(digest, plan)
+    return plan
+
+
+async def find_workflow_by_hash(digest: str, db=None) -> Optional[str]:
+    """
+    Id of an unsaved workflow /build already stored for this graph.
+    Saved workflows are not returned: the hash ignores node positions,
+    so the caller may be about to save an edited layout or a copy.
+    """
+    workflow_id = WORKFLOW_BY_HASH.get(digest)
+    if workflow_id:
+        workflow = await get_workflow(workflow_id, db=db)
+        if workflow and not workflow.get("saved"):
+            return workflow_id
+
+    if db:
+        from db.models.workflow import Workflow
+
+        try:
+            row = (await db.execute(
+                select(Workflow)
+                .where(Workflow.content_hash == digest, Workflow.saved.is_(False))
+                .order_by(Workflow.id)
+                .limit(1)
+            )).scalars().first()
+        except Exception as e:
+            logger.warning("⚠️ Workflow lookup by hash failed: %s", e)
+            return None
+
+        if row:
+            _remember(row.workflow_id, _row_to_workflow(row))
+            return row.workflow_id
+    return None
+
+
+async def create_workflow(nodes: list, edges: list, db=None) -> str:
+    """
+    Store workflow and return workflow_id.
+    An identical graph that was already built (and not saved since)
+    returns its existing id.
+    With a db session the workflow is also written to the workflows table,
+    so it survives restarts and cache eviction.
+    """
+    digest = content_hash(nodes, edges)
+    existing = await find_workflow_by_hash(digest, db=db)
+    if existing:
+        return existing
+
     workflow_id = f"wf_{uuid.uuid4().hex[:8]}"
-    
-    WORKFLOWS[workflow_id] = {
+
+    workflow = {
         "nodes": nodes,
         "edges": edges,
+        "content_hash": digest,
+        "saved": False,
         "created_at": __import__('datetime').datetime.utcnow().isoformat()
     }
-    
+
+    if db:
+        from db.models.workflow import Workflow
+
+        try:
+            db.add(Workflow(
+                workflow_id=workflow_id,
+                name=DEFAULT_WORKFLOW_NAME,
+                nodes=nodes,
+                edges=edges,
+                content_hash=digest,
+            ))
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            logger.warning("⚠️ Workflow %s not persisted: %s", workflow_id, e)
+
+    _remember(workflow_id, workflow)
+
     return workflow_id
 
-def get_workflow(workflow_id: str, db=None) -> Optional[dict]:
+async def save_workflow(workflow_id: str, name: str, nodes: list, edges: list, db) -> bool:
+    """
+    Name and save a workflow and refresh the in-memory copy: either the
+    unsaved row /build created for it, or a new row.
+    Returns True if the row was created, False if a built row was saved.
+    Raises ValueError if the workflow was already saved.
+    """
+    from db.models.workflow import Workflow
+
+    digest = content_hash(nodes, edges)
+    row = (await db.execute(
+        select(Workflow).where(Workflow.workflow_id == workflow_id)
+    )).scalars().first()
+    created = row is None
+
+    if created:
+        row = Workflow(workflow_id=workflow_id)
+        db.add(row)
+    elif row.saved:
+        raise ValueError(f"Workflow already saved as '{row.name}'")
+
+    row.saved = True
+    row.name = name
+    row.nodes = nodes
+    row.edges = edges
+    row.content_hash = digest
+    await db.commit()
+
+    previous = WORKFLOWS.pop(workflow_id)
+    if previous and WORKFLOW_BY_HASH.get(previous["content_hash"]) == workflow_id:
+        WORKFLOW_BY_HASH.pop(previous["content_hash"])
+    _remember(workflow_id, _row_to_workflow(row))
+
+    return created
+
+async def get_workflow(workflow_id: str, db=None) -> Optional[dict]:
     """
     Retrieve workflow by ID:
     1. Check in-memory cache
@@ -28,40 +191,127 @@ def get_workflow(workflow_id: str, db=None) -> Optional[dict]:
     # 1️⃣ In-memory (fast path)
     workflow = WORKFLOWS.get(workflow_id)
     if workflow:
-        print(f"⚡ Workflow {workflow_id} found in memory")
+        logger.debug("⚡ Workflow %s found in memory", workflow_id)
         return workflow
 
-    print(f"🗄️ Workflow {workflow_id} not in memory, checking DB")
+    logger.debug("🗄️ Workflow %s not in memory, checking DB", workflow_id)
 
     # 2️⃣ Database fallback
     if db:
-        db_workflow = (
-            db.query(Workflow)
-            .filter(Workflow.id == workflow_id)
-            .first()
-        )
+        from db.models.workflow import Workflow
+
+        try:
+            db_workflow = (await db.execute(
+                select(Workflow).where(Workflow.workflow_id == workflow_id)
+            )).scalars().first()
+        except Exception as e:
+            logger.warning("⚠️ Workflow DB lookup failed: %s", e)
+            db_workflow = None
 
         if db_workflow:
-            workflow_data = {
-                "nodes": db_workflow.nodes,
-                "edges": db_workflow.edges,
-            }
+            workflow_data = _row_to_workflow(db_workflow)
 
             # 🔁 Warm the cache
-            WORKFLOWS[workflow_id] = workflow_data
-            print(f"✅ Workflow {workflow_id} loaded from DB into memory")
+            _remember(workflow_id, workflow_data)
+            logger.info("✅ Workflow %s loaded from DB into memory", workflow_id)
 
             return workflow_data
 
-    print(f"❌ Workflow {workflow_id} not found anywhere")
+    logger.info("Workflow %s not found anywhere", workflow_id)
     return None
 
+async def get_workflow_plan(workflow_id: str, db=None) -> Optional[CompiledWorkflow]:
+    """
+    Compiled plan for a stored workflow; hot workflows skip all graph work
+    """
+    workflow = await get_workflow(workflow_id, db=db)
+    if not workflow:
+        return None
+
+    plan = workflow.get("plan")
+    if plan is None:
+        plan = compile_cached(workflow["nodes"], workflow["edges"], workflow.get("content_hash"))
+        workflow["plan"] = plan
+    return plan
+
+async def record_execution(workflow_id: str):
+    """
+    Count an execution; counts are written to the DB in batches
+    """
+    global _last_flush
+    with _stats_lock:
+        _execution_counts[workflow_id] += 1
+        due = time.monotonic() - _last_flush >= WORKFLOW_STATS_FLUSH_SECONDS
+        if due:
+            _last_flush = time.monotonic()
+
+    if due:
+        await flush_execution_counts()
+
+async def flush_execution_counts():
+    global _execution_counts
+    with _stats_lock:
+        counts, _execution_counts = _execution_counts, defaultdict(int)
+    if not counts:
+        return
+
+    from db.models.workflow import Workflow
+
+    async with _session() as db:
+        try:
+            for workflow_id, n in counts.items():
+                await db.execute(
+                    update(Workflow)
+                    .where(Workflow.workflow_id == workflow_id)
+                    .values(execution_count=Workflow.execution_count + n)
+                )
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            logger.warning("⚠️ Failed to write workflow execution counts: %s", e)
+
+async def preload_workflows(limit: int = WORKFLOW_PRELOAD) -> int:
+    """
+    Load and compile the most-executed workflows so their first
+    request after a restart is already warm
+    """
+    if limit <= 0:
+        return 0
+
+    from db.models.workflow import Workflow
+
+    try:
+        async with _session() as db:
+            rows = (await db.execute(
+                select(Workflow)
+                .order_by(Workflow.execution_count.desc())
+                .limit(min(limit, WORKFLOW_CACHE_SIZE))
+            )).scalars().all()
+    except Exception as e:
+        logger.warning("⚠️ Workflow preload failed: %s", e)
+        return 0
+
+    loaded = 0
+    for row in rows:
+        workflow = _row_to_workflow(row)
+        try:
+            workflow["plan"] = compile_cached(workflow["nodes"], workflow["edges"], workflow["content_hash"])
+        except ValueError as e:
+            logger.warning("⚠️ Skipping workflow %s: %s", row.workflow_id, e)
+            continue
+        _remember(row.workflow_id, workflow)
+        loaded += 1
+
+    logger.info("🔥 Preloaded %s workflows", loaded)
+    return loaded
+
 def delete_workflow(workflow_id: str) -> bool:
     """
     Delete workflow
     """
-    if workflow_id in WORKFLOWS:
-        del WORKFLOWS[workflow_id]
+    workflow = WORKFLOWS.pop(workflow_id)
+    if workflow:
+        WORKFLOW_BY_HASH.pop(workflow.get("content_hash"))
         return True
     return False
 
@@ -69,4 +319,11 @@ def list_workflows() -> list:
     """
     List all workflow IDs
     """
-    return list(WORKFLOWS.keys())
\ No newline at end of file
+    return WORKFLOWS.keys()
+
+def registry_stats() -> dict:
+    return {
+        "workflows": WORKFLOWS.stats(),
+        "plans": PLANS.stats(),
+        "pending_execution_counts": sum(_execution_counts.values()),
+    }
@@ -3,6 +3,30 @@ from collections import defaultdict, deque
 REQUIRED_SINGLE = ["userQuery"]
 REQUIRED_AT_LEAST_ONE = ["llmEngine", "output"]
 
+def topological_sort(node_ids, graph):
+    """
+    Kahn's algorithm over `graph` (node_id -> list of successor ids).
+    Returns node ids in dependency order; if the graph has a cycle the
+    result is shorter than node_ids.
+    """
+    indegree = defaultdict(int)
+    for src in node_ids:
+        for nxt in graph.get(src, []):
+            indegree[nxt] += 1
+
+    q = deque([n for n in node_ids if indegree[n] == 0])
+    order = []
+
+    while q:
+        cur = q.popleft()
+        order.append(cur)
+        for nxt in graph.get(cur, []):
+            indegree[nxt] -= 1
+            if indegree[nxt] == 0:
+                q.append(nxt)
+
+    return order
+
 def validate_workflow(nodes, edges):
     errors = []
     warnings = []
@@ -33,7 +57,7 @@ def validate_workflow(nodes, edges):
         return {"valid": False, "errors": errors, "warnings": warnings}
     
     # Now safe to access node["id"] and node["type"]
-    node_ids = {n["id"] for n in nodes}
+    node_ids = list(dict.fromkeys(n["id"] for n in nodes))
     node_types = defaultdict(list)
     for n in nodes:
         node_types[n["type"]].append(n["id"])
@@ -50,6 +74,7 @@ def validate_workflow(nodes, edges):
     # Build graph
     graph = defaultdict(list)
     indegree = defaultdict(int)
+    seen_edges = set()
     
     for e in edges:
         if not isinstance(e, dict):
@@ -75,6 +100,11 @@ def validate_workflow(nodes, edges):
             errors.append(f"Edge target '{target}' does not exist")
             continue
         
+        # Duplicate edges (e.g. connected twice on the canvas) count once
+        if (source, target) in seen_edges:
+            continue
+        seen_edges.add((source, target))
+        
         graph[source].append(target)
         indegree[target] += 1
     
@@ -104,18 +134,7 @@ def validate_workflow(nodes, edges):
                 warnings.append("LLM Engine missing model selection")
     
     # Rule 5: Cycle detection (Kahn's algorithm)
-    q = deque([n for n in node_ids if indegree[n] == 0])
-    visited = 0
-    
-    while q:
-        cur = q.popleft()
-        visited += 1
-        for nxt in graph[cur]:
-            indegree[nxt] -= 1
-            if indegree[nxt] == 0:
-                q.append(nxt)
-    
-    if visited != len(node_ids):
+    if len(topological_sort(node_ids, graph)) != len(node_ids):
         errors.append("Workflow contains a cycle (circular dependency)")
     
     return {
@@ -1,4 +1,4 @@
-from db.session import SessionLocal
+from db.session import SessionLocal, get_async_sessionmaker
 
 def get_db():
     db = SessionLocal()
@@ -6,3 +6,7 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with get_async_sessionmaker()() as db:
+        yield db
@@ -0,0 +1,66 @@
+"""
+Schema changes for existing databases (db/migrations/*.sql).
+
+Every file is idempotent, so they are simply all applied in file-name order,
+at startup (DB_MIGRATE_ON_STARTUP) or once per deploy with:
+    python -m db.migrate
+"""
+import asyncio
+import os
+from pathlib import Path
+from typing import List
+
+from utils.log import get_logger
+
+logger = get_logger(__name__)
+
+MIGRATIONS_DIR = Path(__file__).parent / "migrations"
+# Apply the migrations from the lifespan hook (Postgres only)
+DB_MIGRATE_ON_STARTUP = os.getenv("DB_MIGRATE_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+# Advisory lock key: workers starting together migrate one at a time
+_MIGRATION_LOCK = 7_240_015
+
+
+def migration_files() -> List[Path]:
+    return sorted(MIGRATIONS_DIR.glob("*.sql"))
+
+
+def apply_migrations() -> List[str]:
+    """Run every migration in one transaction; returns the applied file names"""
+    from db.session import engine
+
+    if engine.url.get_backend_name() != "postgresql":
+        logger.info("⏭️ Skipping schema migrations (%s is not Postgres)", engine.url.get_backend_name())
+        return []
+
+    applied = []
+    conn = engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", (_MIGRATION_LOCK,))
+        for path in migration_files():
+            cursor.execute(path.read_text(encoding="utf-8"))
+            applied.append(path.name)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    logger.info("🗄️ Applied %s schema migrations", len(applied))
+    return applied
+
+
+async def migrate_on_startup():
+    if not DB_MIGRATE_ON_STARTUP:
+        return
+    try:
+        await asyncio.to_thread(apply_migrations)
+    except Exception as e:
+        logger.warning("⚠️ Schema migrations failed: %s", e)
+
+
+if __name__ == "__main__":
+    for name in apply_migrations():
+        print(name)
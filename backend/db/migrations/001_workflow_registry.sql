@@ -0,0 +1,32 @@
+-- Workflow registry columns (content-hash dedupe, saved flag, execution counts).
+-- Idempotent: safe on a fresh database and on one that already has them.
+
+CREATE TABLE IF NOT EXISTS workflows (
+    id SERIAL PRIMARY KEY,
+    workflow_id VARCHAR NOT NULL,
+    name VARCHAR NOT NULL,
+    nodes JSON NOT NULL,
+    edges JSON NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT now()
+);
+CREATE UNIQUE INDEX IF NOT EXISTS ix_workflows_workflow_id ON workflows (workflow_id);
+CREATE INDEX IF NOT EXISTS ix_workflows_id ON workflows (id);
+
+ALTER TABLE workflows ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);
+CREATE INDEX IF NOT EXISTS ix_workflows_content_hash ON workflows (content_hash);
+
+ALTER TABLE workflows ADD COLUMN IF NOT EXISTS execution_count INTEGER NOT NULL DEFAULT 0;
+
+-- Only /save wrote rows before /build started storing them, so rows without a
+-- content hash were all saved; later rows are saved unless still unnamed.
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'workflows' AND column_name = 'saved'
+    ) THEN
+        ALTER TABLE workflows ADD COLUMN saved BOOLEAN NOT NULL DEFAULT FALSE;
+        UPDATE workflows SET saved = TRUE
+        WHERE content_hash IS NULL OR name <> 'Untitled workflow';
+    END IF;
+END $$;
@@ -0,0 +1,4 @@
+-- Keyset pagination and name-prefix search for GET /api/workflows/.
+
+CREATE INDEX IF NOT EXISTS ix_workflows_created_at_id ON workflows (created_at, id);
+CREATE INDEX IF NOT EXISTS ix_workflows_name_prefix ON workflows (name text_pattern_ops);
@@ -0,0 +1,19 @@
+-- One row per workflow execution (services/trace_service.py, GET /api/traces/slowest).
+
+CREATE TABLE IF NOT EXISTS execution_traces (
+    id SERIAL PRIMARY KEY,
+    workflow_id VARCHAR,
+    content_hash VARCHAR(64),
+    mode VARCHAR(16) NOT NULL,
+    total_ms DOUBLE PRECISION NOT NULL,
+    success BOOLEAN NOT NULL,
+    error VARCHAR,
+    chunks_used INTEGER NOT NULL,
+    prompt_chars INTEGER,
+    answer_chars INTEGER,
+    cache_hit VARCHAR(16),
+    nodes JSON NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS ix_execution_traces_workflow_created_at
+    ON execution_traces (workflow_id, created_at);
@@ -1 +1,2 @@
 from .workflow import Workflow
+from .execution_trace import ExecutionTrace
@@ -0,0 +1,32 @@
+from sqlalchemy import Boolean, Column, Float, Index, Integer, String, JSON, DateTime
+from sqlalchemy.sql import func
+from db.base import Base
+
+# Created by db/migrations/003_execution_traces.sql
+class ExecutionTrace(Base):
+    __tablename__ = "execution_traces"
+    __table_args__ = (
+        # Slowest runs of a workflow within a time window
+        Index("ix_execution_traces_workflow_created_at", "workflow_id", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    # NULL for legacy executions that send nodes/edges instead of a workflow_id
+    workflow_id = Column(String, nullable=True)
+    content_hash = Column(String(64), nullable=True)
+    mode = Column(String(16), nullable=False)  # execute | stream | batch
+
+    total_ms = Column(Float, nullable=False)
+    success = Column(Boolean, nullable=False, default=True)
+    error = Column(String, nullable=True)
+
+    chunks_used = Column(Integer, nullable=False, default=0)
+    prompt_chars = Column(Integer, nullable=True)
+    answer_chars = Column(Integer, nullable=True)
+    # Answer cache outcome of the answering LLM: "exact", "semantic" or NULL (miss)
+    cache_hit = Column(String(16), nullable=True)
+
+    # {node_id: {"type", "ms", "chunks"?, "prompt_chars"?, "answer_chars"?, "cache_hit"?}}
+    nodes = Column(JSON, nullable=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -1,9 +1,16 @@
-from sqlalchemy import Column, Integer, String, JSON, DateTime
+from sqlalchemy import Boolean, Column, Index, Integer, String, JSON, DateTime
 from sqlalchemy.sql import func
 from db.base import Base 
 
 class Workflow(Base):
     __tablename__ = "workflows"
+    # Indexes also created by db/migrations/002_workflow_list_indexes.sql
+    __table_args__ = (
+        # Keyset pagination for the workflow list
+        Index("ix_workflows_created_at_id", "created_at", "id"),
+        # Name prefix search (text_pattern_ops lets Postgres use it for LIKE 'abc%')
+        Index("ix_workflows_name_prefix", "name", postgresql_ops={"name": "text_pattern_ops"}),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     workflow_id = Column(String, unique=True, index=True, nullable=False)
@@ -11,4 +18,13 @@ class Workflow(Base):
     nodes = Column(JSON, nullable=False)
     edges = Column(JSON, nullable=False)
 
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
+    # Registry columns; existing databases get them from db/migrations/001_workflow_registry.sql
+    # Graph content hash (core.workflow_compiler.content_hash), so /build can reuse rows
+    content_hash = Column(String(64), index=True, nullable=True)
+    # False for rows /build stores before the user names them in /save;
+    # only saved workflows are listed
+    saved = Column(Boolean, nullable=False, default=False, server_default="false")
+    # Used to preload the hottest workflows at startup
+    execution_count = Column(Integer, nullable=False, default=0, server_default="0")
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
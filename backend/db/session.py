@@ -1,5 +1,6 @@
 import os
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
 
@@ -7,12 +8,18 @@ load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Connection pool sizing (applies to both engines)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
 engine = create_engine(
     DATABASE_URL,
     pool_pre_ping=True,        
-    pool_size=5,
-    max_overflow=10,
-    pool_timeout=30,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
     echo=False         
 )
 
@@ -27,4 +34,93 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+# --------------------------------------------------
+# Async engine: asyncpg for Postgres, aiosqlite for local SQLite
+# --------------------------------------------------
+
+def async_database_url(url: str):
+    """
+    Same database as DATABASE_URL, through an async driver.
+    Returns (url, connect_args).
+    """
+    url = make_url(url)
+    connect_args = {}
+
+    if url.get_backend_name() == "postgresql":
+        # asyncpg takes `ssl` instead of libpq's sslmode/channel_binding
+        query = dict(url.query)
+        sslmode = query.pop("sslmode", None)
+        query.pop("channel_binding", None)
+        if sslmode and sslmode != "disable":
+            connect_args["ssl"] = sslmode
+        url = url.set(drivername="postgresql+asyncpg", query=query)
+
+    elif url.get_backend_name() == "sqlite":
+        url = url.set(drivername="sqlite+aiosqlite")
+
+    return url, connect_args
+
+
+_async_engine = None
+_async_sessionmaker = None
+
+def get_async_engine():
+    global _async_engine
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        url, connect_args = async_database_url(DATABASE_URL)
+        pool_args = {}
+        if url.get_backend_name() != "sqlite":
+            pool_args = {
+                "pool_size": DB_POOL_SIZE,
+                "max_overflow": DB_MAX_OVERFLOW,
+                "pool_timeout": DB_POOL_TIMEOUT,
+                "pool_recycle": DB_POOL_RECYCLE,
+            }
+
+        _async_engine = create_async_engine(
+            url,
+            pool_pre_ping=True,
+            connect_args=connect_args,
+            echo=False,
+            **pool_args,
+        )
+    return _async_engine
+
+def get_async_sessionmaker():
+    global _async_sessionmaker
+    if _async_sessionmaker is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+
+        _async_sessionmaker = async_sessionmaker(
+            bind=get_async_engine(),
+            autoflush=False,
+            expire_on_commit=False,
+        )
+    return _async_sessionmaker
+
+
+def _pool_stats(pool) -> dict:
+    stats = {"class": type(pool).__name__}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        method = getattr(pool, name, None)
+        if callable(method):
+            stats[name] = method()
+    return stats
+
+def pool_stats() -> dict:
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "sync": _pool_stats(engine.pool),
+        "async": _pool_stats(_async_engine.sync_engine.pool) if _async_engine else None,
+    }
+
+async def dispose_async_engine():
+    if _async_engine is not None:
+        await _async_engine.dispose()
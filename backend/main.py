@@ -2,13 +2,53 @@ from dotenv import load_dotenv
 load_dotenv()
 
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 
 # Import all routers
-from api import documents, workflows, execute
+from api import documents, workflows, execute, traces, profiles
+from services.embedding_service import get_query_embedding_cache
+from services.answer_cache import get_answer_cache
+from services.embedding_cache import get_embedding_cache
+from services.workflow_executor import get_execution_singleflight
+from core.workflow_registry import flush_execution_counts, preload_workflows, registry_stats
+from db.migrate import migrate_on_startup
+from db.session import dispose_async_engine, pool_stats
+from services.web_search_service import get_web_search_service
+from services.ingestion_service import shutdown_ingestion_workers
+from services.warmup import get_readiness, start_prewarm
+from services.trace_service import get_trace_writer
+from utils.log import stop_logging
+from utils.metrics import render_metrics
 
-app = FastAPI(title="AI Workflow Backend")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Model / Chroma / LLM client load in the background (STARTUP_PREWARM)
+    readiness = start_prewarm()
+    # Schema changes in db/migrations (DB_MIGRATE_ON_STARTUP)
+    await migrate_on_startup()
+    # No-op unless WORKFLOW_PRELOAD is set
+    await preload_workflows()
+    # Batched writes of execution traces (see EXECUTION_TRACES)
+    trace_writer = get_trace_writer()
+    trace_writer.start()
+
+    yield
+
+    if readiness.task and not readiness.task.done():
+        readiness.task.cancel()
+    await flush_execution_counts()
+    await trace_writer.aclose()
+    await dispose_async_engine()
+    await get_web_search_service().aclose()
+    shutdown_ingestion_workers()
+    stop_logging()
+
+
+app = FastAPI(title="AI Workflow Backend", lifespan=lifespan)
 
 # CORS
 app.add_middleware(
@@ -17,17 +57,50 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Pagination headers of GET /api/workflows/, profile id of X-Profile requests
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "X-Profile-Id"],
 )
 
 # Register routers (only once each!)
 app.include_router(documents.router)
 app.include_router(workflows.router)
 app.include_router(execute.router)
+app.include_router(traces.router)
+app.include_router(profiles.router)
 
 @app.get("/health")
 def health():
+    # Liveness: the process is up (models may still be loading)
     return {"status": "ok"}
 
+@app.get("/ready")
+def ready():
+    # Readiness: prewarm finished, safe to route traffic here
+    status = get_readiness().status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+@app.get("/cache/stats")
+def cache_stats():
+    return {
+        "query_embeddings": get_query_embedding_cache().stats(),
+        "answers": get_answer_cache().stats(),
+        "chunk_embeddings": get_embedding_cache().stats(),
+        "executions": get_execution_singleflight().stats(),
+        "workflows": registry_stats(),
+        "web_search": get_web_search_service().stats(),
+        "execution_traces": get_trace_writer().stats(),
+    }
+
+@app.get("/metrics")
+def metrics():
+    # Prometheus scrape: per-stage latency histograms, cache hit/miss and error counters
+    content, content_type = render_metrics()
+    return Response(content, media_type=content_type)
+
+@app.get("/db/pool")
+def db_pool():
+    return pool_stats()
+
 @app.get("/")
 def root():
     return {"message": "AI Workflow Backend running"}
@@ -0,0 +1,155 @@
+import hashlib
+import os
+import threading
+from typing import Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+from utils.cache import TTLCache
+
+# Opt-in: answers are only cached when ANSWER_CACHE_ENABLED is truthy
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1024"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+# Cosine similarity for a semantic hit; 0 disables the semantic path
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.97"))
+
+
+class _Bucket:
+    """Query embeddings of the entries sharing one (workflow, model, kb_version)"""
+
+    def __init__(self):
+        self.embeddings: Dict[Tuple, List[float]] = {}
+        self._keys: List[Tuple] = []
+        self._matrix = None
+
+    def add(self, key: Tuple, embedding: List[float]):
+        self.embeddings[key] = embedding
+        self._matrix = None
+
+    def discard(self, key: Tuple):
+        if self.embeddings.pop(key, None) is not None:
+            self._matrix = None
+
+    def ranked(self, query_embedding: List[float], threshold: float) -> List[Tuple]:
+        """Keys scoring at least `threshold`, best first"""
+        if self._matrix is None:
+            self._keys = list(self.embeddings)
+            self._matrix = np.asarray([self.embeddings[k] for k in self._keys], dtype=np.float32)
+        # Query embeddings are L2-normalised, so dot product == cosine
+        scores = self._matrix @ np.asarray(query_embedding, dtype=np.float32)
+        order = np.argsort(-scores)
+        return [self._keys[i] for i in order if scores[i] >= threshold]
+
+
+class AnswerCache:
+    """
+    LLM answer cache for workflow executions.
+
+    Exact hits are keyed by (workflow_id, retrieved chunk ids, prompt).
+    Semantic hits match any live answer from the same workflow whose query
+    embedding is within `similarity` cosine of the new one; candidates are
+    bucketed by (workflow, model, kb_version) and scored with one matrix
+    product. Every entry is stamped with the knowledge base version it was
+    built on, so writes to the vector store invalidate it.
+
+    The cache and the kb versions are per process: with several workers an
+    upload only invalidates the worker that handled it, and the others keep
+    serving old answers for up to ANSWER_CACHE_TTL. Run a single worker (or
+    a short TTL) if answers must follow uploads immediately.
+    """
+
+    def __init__(self, maxsize: int = ANSWER_CACHE_SIZE, ttl: float = ANSWER_CACHE_TTL,
+                 similarity: float = ANSWER_CACHE_SIMILARITY):
+        self.similarity = similarity
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._buckets: Dict[Tuple, _Bucket] = {}
+        self._bucketed = 0
+        self._lock = threading.Lock()
+        self.semantic_hits = 0
+
+    @staticmethod
+    def make_key(workflow_id: str, chunk_ids: List[str], prompt: str,
+                 model: str, kb_version: Hashable) -> Tuple:
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        return (workflow_id, tuple(sorted(chunk_ids)), prompt_hash, model, kb_version)
+
+    def lookup(self, key: Tuple, query_embedding: Optional[List[float]] = None) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Returns (answer, hit_kind) where hit_kind is "exact", "semantic" or None
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            return entry["answer"], "exact"
+
+        if not self.similarity or query_embedding is None:
+            return None, None
+
+        workflow_id, _, _, model, kb_version = key
+        with self._lock:
+            bucket = self._buckets.get((workflow_id, model, kb_version))
+            if bucket is None or not bucket.embeddings:
+                return None, None
+
+            for candidate in bucket.ranked(query_embedding, self.similarity):
+                entry = self._entries.get(candidate)
+                if entry is not None:
+                    self.semantic_hits += 1
+                    return entry["answer"], "semantic"
+                # Evicted or expired from the LRU since it was bucketed
+                bucket.discard(candidate)
+                self._bucketed -= 1
+
+        return None, None
+
+    def store(self, key: Tuple, answer: str, query_embedding: Optional[List[float]] = None):
+        workflow_id, _, _, model, kb_version = key
+        self._entries.set(key, {
+            "answer": answer,
+            "workflow_id": workflow_id,
+            "model": model,
+            "kb_version": kb_version,
+            "embedding": query_embedding,
+        })
+        if query_embedding is None:
+            return
+
+        with self._lock:
+            bucket = self._buckets.setdefault((workflow_id, model, kb_version), _Bucket())
+            if key not in bucket.embeddings:
+                self._bucketed += 1
+            bucket.add(key, query_embedding)
+            if self._bucketed > 2 * self._entries.maxsize:
+                self._prune()
+
+    def _prune(self):
+        """Drop bucketed keys whose entries the LRU has evicted (and old kb versions)"""
+        live = set(self._entries.keys())
+        for bucket_key, bucket in list(self._buckets.items()):
+            for key in [k for k in bucket.embeddings if k not in live]:
+                bucket.discard(key)
+            if not bucket.embeddings:
+                del self._buckets[bucket_key]
+        self._bucketed = sum(len(b.embeddings) for b in self._buckets.values())
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+            self._bucketed = 0
+
+    def stats(self) -> dict:
+        stats = self._entries.stats()
+        stats["enabled"] = ANSWER_CACHE_ENABLED
+        stats["similarity"] = self.similarity
+        stats["semantic_hits"] = self.semantic_hits
+        return stats
+
+
+_answer_cache = None
+
+def get_answer_cache() -> AnswerCache:
+    global _answer_cache
+    if _answer_cache is None:
+        _answer_cache = AnswerCache()
+    return _answer_cache
@@ -0,0 +1,124 @@
+import math
+import re
+import sqlite3
+import threading
+from collections import Counter
+from typing import Dict, List, Tuple
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Keeps error codes and part numbers like "E-1042" or "P778.2" as one term
+_TERM_RE = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TERM_RE.findall(text.lower())
+
+
+class BM25Index:
+    """
+    Persistent inverted index (SQLite) kept next to a namespace's Chroma
+    collection, for exact-term retrieval that cosine search misses.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS chunks (
+                chunk_id TEXT PRIMARY KEY,
+                document_id TEXT,
+                chunk_index INTEGER,
+                length INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ix_chunks_document ON chunks (document_id, chunk_index);
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                chunk_id TEXT NOT NULL,
+                tf INTEGER NOT NULL,
+                PRIMARY KEY (term, chunk_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS ix_postings_chunk ON postings (chunk_id);
+            """
+        )
+        self._conn.commit()
+
+    def _delete_chunks(self, chunk_ids: List[str]):
+        for chunk_id in chunk_ids:
+            self._conn.execute("DELETE FROM postings WHERE chunk_id = ?", (chunk_id,))
+            self._conn.execute("DELETE FROM chunks WHERE chunk_id = ?", (chunk_id,))
+
+    def add(self, ids: List[str], texts: List[str], metadatas: List[dict]):
+        with self._lock:
+            # upsert semantics, matching the Chroma collection
+            self._delete_chunks(ids)
+            for chunk_id, text, metadata in zip(ids, texts, metadatas):
+                terms = Counter(tokenize(text))
+                self._conn.execute(
+                    "INSERT INTO chunks (chunk_id, document_id, chunk_index, length) VALUES (?, ?, ?, ?)",
+                    (chunk_id, metadata.get("document_id"), metadata.get("chunk_index"), sum(terms.values())),
+                )
+                self._conn.executemany(
+                    "INSERT INTO postings (term, chunk_id, tf) VALUES (?, ?, ?)",
+                    [(term, chunk_id, tf) for term, tf in terms.items()],
+                )
+            self._conn.commit()
+
+    def delete_document(self, document_id: str, from_chunk: int = 0):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT chunk_id FROM chunks WHERE document_id = ? AND chunk_index >= ?",
+                (document_id, from_chunk),
+            ).fetchall()
+            self._delete_chunks([r[0] for r in rows])
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM postings")
+            self._conn.execute("DELETE FROM chunks")
+            self._conn.commit()
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[str, float]]:
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+
+        with self._lock:
+            n_docs, total_length = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(length), 0) FROM chunks"
+            ).fetchone()
+            if not n_docs:
+                return []
+            avg_length = total_length / n_docs
+
+            scores: Dict[str, float] = {}
+            for term in terms:
+                rows = self._conn.execute(
+                    "SELECT p.chunk_id, p.tf, c.length FROM postings p "
+                    "JOIN chunks c ON c.chunk_id = p.chunk_id WHERE p.term = ?",
+                    (term,),
+                ).fetchall()
+                if not rows:
+                    continue
+
+                idf = math.log(1 + (n_docs - len(rows) + 0.5) / (len(rows) + 0.5))
+                for chunk_id, tf, length in rows:
+                    norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length)
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (BM25_K1 + 1) / norm
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Merge ranked id lists: score(id) = sum over lists of 1 / (k + rank)"""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking, start=1):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
@@ -1,18 +1,171 @@
+import asyncio
+import os
+import threading
+from utils.cache import TTLCache
+from utils.metrics import cache_event, observe
+
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Inference backend: "torch" (default), "onnx" (ONNX Runtime, fp32) or
+# "onnx-int8" (ONNX Runtime, int8-quantized weights). All produce 384-dim
+# normalized vectors that can be searched against the same collections.
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+# Quantized export shipped in the model repo (avx2 build runs on any x86-64 with AVX2)
+EMBEDDING_ONNX_INT8_FILE = os.getenv("EMBEDDING_ONNX_INT8_FILE", "onnx/model_quint8_avx2.onnx")
+
+# Identifies the vectors in caches: backends differ slightly, so never mix them
+EMBEDDING_MODEL_KEY = (
+    EMBEDDING_MODEL_NAME if EMBEDDING_BACKEND == "torch"
+    else f"{EMBEDDING_MODEL_NAME}@{EMBEDDING_BACKEND}"
+)
+
+# Micro-batching knobs for concurrent query embeddings
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "64"))
+EMBED_MAX_WAIT_MS = float(os.getenv("EMBED_MAX_WAIT_MS", "5"))
+
+# Query embedding cache sizing
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "4096"))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_EMBEDDING_CACHE_TTL", "86400"))
+
 _model = None
+_model_lock = threading.Lock()
+
+def load_embedding_model(backend: str = EMBEDDING_BACKEND):
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}', expected one of {EMBEDDING_BACKENDS}")
+
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "torch":
+        return SentenceTransformer(EMBEDDING_MODEL_NAME, device="cpu")
+
+    model_kwargs = {"file_name": EMBEDDING_ONNX_INT8_FILE} if backend == "onnx-int8" else None
+    return SentenceTransformer(
+        EMBEDDING_MODEL_NAME,
+        device="cpu",
+        backend="onnx",
+        model_kwargs=model_kwargs,
+    )
 
 def get_embedding_model():
     global _model
     if _model is None:
-        from sentence_transformers import SentenceTransformer
-        _model = SentenceTransformer(
-            "all-MiniLM-L6-v2",
-            device="cpu"
-        )
+        # The batcher's executor and to_thread callers may race to the first load
+        with _model_lock:
+            if _model is None:
+                _model = load_embedding_model()
     return _model
 
+
+def token_spans(text: str) -> list[tuple[int, int]]:
+    """Character offsets of the tokens the embedding model sees (for chunk budgets)"""
+    return tokenizer_spans(get_embedding_model().tokenizer, text)
+
+
+def tokenizer_spans(tokenizer, text: str) -> list[tuple[int, int]]:
+    return tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)["offset_mapping"]
+
+
+def encode_queries(texts: list[str]) -> list[list[float]]:
+    # One call, but forward passes of at most EMBED_MAX_BATCH (batch executions
+    # can hand over thousands of queries)
+    return get_embedding_model().encode(
+        texts,
+        batch_size=min(len(texts), EMBED_MAX_BATCH),
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+    ).tolist()
+
+
+class EmbeddingBatcher:
+    """
+    Collects concurrent query embeddings for up to `max_wait_ms`
+    (or until `max_batch` are queued), runs one batched encode in a
+    worker thread and hands each caller its own vector.
+    """
+
+    def __init__(self, max_batch: int = EMBED_MAX_BATCH, max_wait_ms: float = EMBED_MAX_WAIT_MS):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue = None
+        self._loop = None
+        self._worker = None
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def embed(self, text: str) -> list[float]:
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            texts = [text for text, _ in batch]
+            try:
+                vectors = await loop.run_in_executor(None, encode_queries, texts)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
+
+
+def normalize_query(text: str) -> str:
+    # The model is uncased, so case and whitespace don't change the vector
+    return " ".join(text.lower().split())
+
+
+_query_cache = None
+
+def get_query_embedding_cache() -> TTLCache:
+    global _query_cache
+    if _query_cache is None:
+        _query_cache = TTLCache(maxsize=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL)
+    return _query_cache
+
+
+_batcher = None
+
+def get_embedding_batcher() -> EmbeddingBatcher:
+    global _batcher
+    if _batcher is None:
+        _batcher = EmbeddingBatcher()
+    return _batcher
+
+
 class EmbeddingService:
-    def __init__(self):
-        self.model = get_embedding_model()
+    # Cheap to construct: the model is loaded on first use by the sync
+    # methods; the async ones only encode in worker threads, so a cold
+    # model never loads on the event loop.
+
+    @property
+    def model(self):
+        return get_embedding_model()
 
     def embed_texts(self, texts: list[str]) -> list[list[float]]:
         embeddings = self.model.encode(
@@ -24,8 +177,55 @@ class EmbeddingService:
         return embeddings.tolist()
 
     def embed_query(self, text: str) -> list[float]:
-        return self.model.encode(
-            text,
-            convert_to_numpy=True,
-            normalize_embeddings=True,
-        ).tolist()
+        text = normalize_query(text)
+        key = (EMBEDDING_MODEL_KEY, text)
+        cache = get_query_embedding_cache()
+
+        embedding = cache.get(key)
+        if embedding is None:
+            embedding = self.model.encode(
+                text,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+            ).tolist()
+            cache.set(key, embedding)
+        return embedding
+
+    async def aembed_query(self, text: str) -> list[float]:
+        """Cached, batched, non-blocking embed_query for use inside async handlers."""
+        text = normalize_query(text)
+        key = (EMBEDDING_MODEL_KEY, text)
+        cache = get_query_embedding_cache()
+
+        embedding = cache.get(key)
+        cache_event("query_embedding", embedding is not None)
+        if embedding is None:
+            with observe("query_embed"):
+                embedding = await get_embedding_batcher().embed(text)
+            cache.set(key, embedding)
+        return embedding
+
+    async def aembed_queries(self, texts: list[str]) -> list[list[float]]:
+        """
+        Embeddings for many queries at once: cache hits are reused and all
+        misses go through a single batched encode (off the event loop).
+        """
+        texts = [normalize_query(t) for t in texts]
+        cache = get_query_embedding_cache()
+
+        found = {}
+        for text in texts:
+            if text not in found:
+                found[text] = cache.get((EMBEDDING_MODEL_KEY, text))
+
+        missing = [t for t, v in found.items() if v is None]
+        cache_event("query_embedding", True, len(found) - len(missing))
+        cache_event("query_embedding", False, len(missing))
+        if missing:
+            with observe("query_embed"):
+                embeddings = await asyncio.to_thread(encode_queries, missing)
+            for text, embedding in zip(missing, embeddings):
+                found[text] = embedding
+                cache.set((EMBEDDING_MODEL_KEY, text), embedding)
+
+        return [found[t] for t in texts]
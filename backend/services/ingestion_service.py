@@ -0,0 +1,368 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional
+
+from services.vector_store_service import (
+    aget_vector_store,
+    get_vector_store,
+    document_id_for,
+    chunk_id_for,
+    resolve_namespace,
+)
+from services.embedding_service import EMBEDDING_MODEL_KEY, get_embedding_model, token_spans
+from services.embedding_cache import get_embedding_cache, text_hash
+from services.pdf_worker import init_worker, parse_pdf
+from utils.chunking import iter_chunks
+from utils.log import get_logger
+from utils.metrics import STAGE_SECONDS, TimedIterator, cache_event, observe
+
+logger = get_logger(__name__)
+
+# Chunks embedded + stored per round trip; bounds peak memory during ingestion
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "128"))
+
+# Chunk budget in embedding-model tokens (all-MiniLM-L6-v2 truncates at 256)
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "200"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "30"))
+
+# Batch uploads: PDF parsing processes, and chunks per cross-file embedding batch
+INGEST_PROCESSES = int(os.getenv("INGEST_PROCESSES", str(os.cpu_count() or 1)))
+INGEST_EMBED_BATCH_SIZE = int(os.getenv("INGEST_EMBED_BATCH_SIZE", "512"))
+
+
+def iter_pdf_pages(path: str) -> Iterator[str]:
+    import fitz
+
+    doc = fitz.open(path)
+    try:
+        for page in doc:
+            yield page.get_text()
+    finally:
+        doc.close()
+
+
+def embed_chunks(texts: list[str]) -> tuple[list[list[float]], int]:
+    """
+    Embed chunks, reusing vectors from the on-disk cache where possible.
+    Returns (embeddings, cache_hits).
+    """
+    with observe("embed"):
+        cache = get_embedding_cache()
+        hashes = [text_hash(t) for t in texts]
+        cached = cache.get_many(EMBEDDING_MODEL_KEY, hashes)
+
+        missing = [i for i, h in enumerate(hashes) if h not in cached]
+        if missing:
+            fresh = get_embedding_model().encode(
+                [texts[i] for i in missing],
+                batch_size=32,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+            ).tolist()
+            new_vectors = {hashes[i]: v for i, v in zip(missing, fresh)}
+            cache.put_many(EMBEDDING_MODEL_KEY, new_vectors)
+            cached.update(new_vectors)
+
+    cache_event("chunk_embedding", True, len(texts) - len(missing))
+    cache_event("chunk_embedding", False, len(missing))
+    return [cached[h] for h in hashes], len(texts) - len(missing)
+
+
+def ingest_pdf(path: str, filename: str, content_hash: str, namespace: Optional[str] = None) -> dict:
+    """
+    Stream a PDF from disk into the vector store page by page.
+
+    Chunks are embedded and stored in batches of INGEST_BATCH_SIZE, so memory
+    stays flat regardless of document size and every stored batch survives
+    a failure later in the file.
+
+    The document is upserted under a stable id derived from its filename
+    into the given knowledge base namespace; other documents are left alone.
+    If the same file (same content_hash) is already fully stored, nothing is
+    re-embedded.
+    """
+    start = time.time()
+    namespace = resolve_namespace(namespace)
+    vector_store = get_vector_store()
+    document_id = document_id_for(filename)
+
+    existing = vector_store.get_document(document_id, namespace=namespace)
+    if existing and existing.get("complete") and existing.get("content_hash") == content_hash:
+        logger.info("⏭️ %s unchanged, skipping ingestion", filename)
+        return {
+            "document_id": document_id,
+            "namespace": namespace,
+            "chunks_created": existing.get("total_chunks", 0),
+            "skipped": True,
+        }
+
+    chunks_created = 0
+    cache_hits = 0
+    flush_seconds = 0.0
+    ids, texts, metadatas = [], [], []
+
+    def flush():
+        nonlocal cache_hits, flush_seconds
+        flush_start = time.perf_counter()
+        embeddings, hits = embed_chunks(texts)
+        cache_hits += hits
+        with observe("store"):
+            vector_store.add_text(
+                texts=texts,
+                embeddings=embeddings,
+                metadatas=metadatas,
+                ids=ids,
+                namespace=namespace,
+            )
+        flush_seconds += time.perf_counter() - flush_start
+
+    # Extraction, chunking and flushes interleave: time the pages as they are
+    # pulled and attribute whatever else the loop spends to chunking
+    pages = TimedIterator(iter_pdf_pages(path), "pdf_parse")
+    loop_start = time.perf_counter()
+    chunks = iter_chunks(
+        pages,
+        max_tokens=CHUNK_MAX_TOKENS,
+        overlap_tokens=CHUNK_OVERLAP_TOKENS,
+        token_spans=token_spans,
+    )
+    for chunk, page_index in chunks:
+        ids.append(chunk_id_for(document_id, chunks_created))
+        texts.append(chunk)
+        metadatas.append({
+            "document_id": document_id,
+            "filename": filename,
+            "content_hash": content_hash,
+            "chunk_index": chunks_created,
+            "page": page_index + 1,
+        })
+        chunks_created += 1
+
+        if len(texts) >= INGEST_BATCH_SIZE:
+            flush()
+            ids, texts, metadatas = [], [], []
+            logger.debug("💾 Stored %s chunks so far", chunks_created)
+
+    if texts:
+        flush()
+    STAGE_SECONDS.labels("chunk").observe(time.perf_counter() - loop_start - flush_seconds - pages.seconds)
+
+    if chunks_created:
+        # Drop chunks left over from a longer previous version, then flag done
+        vector_store.delete_document(document_id, from_chunk=chunks_created, namespace=namespace)
+        vector_store.mark_document_complete(document_id, chunks_created, namespace=namespace)
+
+    hit_rate = cache_hits / chunks_created if chunks_created else 0.0
+    logger.info("🎉 Ingested %s: %s chunks in %.2fs (embedding cache hit rate %.0f%%)",
+                filename, chunks_created, time.time() - start, hit_rate * 100)
+    return {
+        "document_id": document_id,
+        "namespace": namespace,
+        "chunks_created": chunks_created,
+        "skipped": False,
+        "embedding_cache": {
+            "hits": cache_hits,
+            "misses": chunks_created - cache_hits,
+            "hit_rate": round(hit_rate, 4),
+        },
+    }
+
+
+# --------------------------------------------------
+# Batch ingestion: parse in processes, embed across files
+# --------------------------------------------------
+
+_parse_pool = None
+_embed_worker = None
+
+def get_parse_pool() -> ProcessPoolExecutor:
+    global _parse_pool
+    if _parse_pool is None:
+        # spawn: forking a process that already holds torch threads can hang
+        _parse_pool = ProcessPoolExecutor(
+            max_workers=INGEST_PROCESSES,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+        )
+    return _parse_pool
+
+def get_embed_worker() -> ThreadPoolExecutor:
+    """Single thread that owns embedding + storing for batch ingestion"""
+    global _embed_worker
+    if _embed_worker is None:
+        _embed_worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest-embed")
+    return _embed_worker
+
+def shutdown_ingestion_workers():
+    global _parse_pool, _embed_worker
+    if _parse_pool is not None:
+        _parse_pool.shutdown(wait=False, cancel_futures=True)
+        _parse_pool = None
+    if _embed_worker is not None:
+        _embed_worker.shutdown(wait=False, cancel_futures=True)
+        _embed_worker = None
+
+
+@dataclass
+class _BatchDocument:
+    filename: str
+    content_hash: str
+    document_id: str
+    pages: int = 0
+    chunks: int = 0
+    error: Optional[str] = None
+    skipped: bool = False
+
+
+def _store_batch(batch: List[tuple], namespace: str) -> int:
+    """Embed + upsert chunks from any number of documents; returns cache hits"""
+    texts = [text for _, _, text, _ in batch]
+    embeddings, hits = embed_chunks(texts)
+    with observe("store"):
+        get_vector_store().add_text(
+            texts=texts,
+            embeddings=embeddings,
+            metadatas=[metadata for _, _, _, metadata in batch],
+            ids=[chunk_id for _, chunk_id, _, _ in batch],
+            namespace=namespace,
+        )
+    return hits
+
+
+def _finish_document(doc: _BatchDocument, namespace: str):
+    vector_store = get_vector_store()
+    vector_store.delete_document(doc.document_id, from_chunk=doc.chunks, namespace=namespace)
+    vector_store.mark_document_complete(doc.document_id, doc.chunks, namespace=namespace)
+
+
+async def ingest_pdfs_batch(files: List[Dict], namespace: Optional[str] = None) -> dict:
+    """
+    Ingest many spooled PDFs ({path, filename, content_hash}) at once.
+
+    PDFs are parsed and chunked in a process pool (all cores), and their
+    chunks are embedded in large cross-file batches by one dedicated
+    worker thread, so the event loop only coordinates.
+    """
+    start = time.perf_counter()
+    namespace = resolve_namespace(namespace)
+    loop = asyncio.get_running_loop()
+    vector_store = await aget_vector_store()
+    embed_worker = get_embed_worker()
+
+    docs = [
+        _BatchDocument(f["filename"], f["content_hash"], document_id_for(f["filename"]))
+        for f in files
+    ]
+    # Bounded so parsed chunks wait for the embedder instead of piling up
+    queue: asyncio.Queue = asyncio.Queue(maxsize=INGEST_EMBED_BATCH_SIZE * 4)
+
+    async def parse(doc: _BatchDocument, path: str):
+        try:
+            existing = await loop.run_in_executor(
+                embed_worker, lambda: vector_store.get_document(doc.document_id, namespace=namespace)
+            )
+            if existing and existing.get("complete") and existing.get("content_hash") == doc.content_hash:
+                doc.skipped = True
+                doc.chunks = existing.get("total_chunks", 0)
+                return
+
+            # Extraction and chunking both happen in the worker process, so
+            # batch uploads report them together under pdf_parse
+            with observe("pdf_parse"):
+                chunks, doc.pages = await loop.run_in_executor(
+                    get_parse_pool(), parse_pdf, path, CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS
+                )
+            doc.chunks = len(chunks)
+            for i, (text, page_index) in enumerate(chunks):
+                await queue.put((doc, chunk_id_for(doc.document_id, i), text, {
+                    "document_id": doc.document_id,
+                    "filename": doc.filename,
+                    "content_hash": doc.content_hash,
+                    "chunk_index": i,
+                    "page": page_index + 1,
+                }))
+            logger.debug("📄 Parsed %s: %s pages, %s chunks", doc.filename, doc.pages, doc.chunks)
+        except Exception as e:
+            logger.error("❌ Failed to parse %s: %s", doc.filename, e)
+            doc.error = str(e)
+        finally:
+            await queue.put(None)  # wake the embedder so it can re-check progress
+
+    async def embed():
+        batch: List[tuple] = []
+        parsing = len(docs)
+
+        async def flush():
+            nonlocal cache_hits
+            stored = list(batch)
+            batch.clear()
+            files_in_batch = {id(doc): doc for doc, _, _, _ in stored}.values()
+            try:
+                cache_hits += await loop.run_in_executor(embed_worker, _store_batch, stored, namespace)
+                logger.debug("💾 Stored %s chunks from %s files", len(stored), len(files_in_batch))
+            except Exception as e:
+                logger.error("❌ Embedding batch failed: %s", e)
+                for doc in files_in_batch:
+                    doc.error = doc.error or str(e)
+
+        while parsing:
+            item = await queue.get()
+            if item is None:
+                parsing -= 1
+            else:
+                batch.append(item)
+                if len(batch) >= INGEST_EMBED_BATCH_SIZE:
+                    await flush()
+        if batch:
+            await flush()
+
+    cache_hits = 0
+    await asyncio.gather(
+        embed(),
+        *(parse(doc, f["path"]) for doc, f in zip(docs, files)),
+    )
+
+    for doc in docs:
+        if doc.skipped or doc.error:
+            continue
+        if not doc.chunks:
+            doc.error = "No text found in PDF"
+            continue
+        try:
+            await loop.run_in_executor(embed_worker, _finish_document, doc, namespace)
+        except Exception as e:
+            doc.error = str(e)
+
+    elapsed = time.perf_counter() - start
+    pages = sum(d.pages for d in docs)
+    chunks = sum(d.chunks for d in docs if not d.skipped)
+    logger.info("🎉 Batch ingested %s files, %s pages, %s chunks in %.2fs (%.1f pages/s)",
+                len(docs), pages, chunks, elapsed, pages / elapsed if elapsed else 0)
+
+    return {
+        "namespace": namespace,
+        "documents": [
+            {
+                "filename": d.filename,
+                "document_id": d.document_id,
+                "pages": d.pages,
+                "chunks_created": d.chunks,
+                "skipped": d.skipped,
+                "error": d.error,
+            }
+            for d in docs
+        ],
+        "pages": pages,
+        "chunks_created": chunks,
+        "seconds": round(elapsed, 3),
+        "pages_per_sec": round(pages / elapsed, 2) if elapsed else 0.0,
+        "embedding_cache": {
+            "hits": cache_hits,
+            "misses": chunks - cache_hits,
+            "hit_rate": round(cache_hits / chunks, 4) if chunks else 0.0,
+        },
+    }
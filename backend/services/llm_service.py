@@ -1,8 +1,15 @@
+import asyncio
 import os
-from typing import Optional
-import google.genai as genai
+from typing import AsyncIterator, Optional
+
+DEFAULT_MODEL = "gemini-flash-latest"
+
+# Max Gemini calls in flight per worker process
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
 
 _client = None
+_semaphore = None
+
 
 def get_llm_client():
     global _client
@@ -12,36 +19,80 @@ def get_llm_client():
         if not api_key:
             raise RuntimeError("GOOGLE_API_KEY not set")
 
-        # New SDK client
+        # Imported on first use: google.genai is slow to import
+        import google.genai as genai
+
+        # New SDK client (sync + .aio share one connection pool)
         _client = genai.Client(api_key=api_key)
 
     return _client
 
 
+def get_llm_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+
+    return _semaphore
+
+
+def build_prompt(question: str, context: Optional[str] = None) -> str:
+    if context:
+        return f"""
+You are a helpful assistant.
+Use the following context to answer the question.
+
+Context:
+{context}
+
+Question:
+{question}
+"""
+    return question
+
+
 class LLMService:
     def chat(self, prompt: str) -> str:
         client = get_llm_client()
 
         response = client.models.generate_content(
-            model="gemini-flash-latest",
+            model=DEFAULT_MODEL,
             contents=prompt,
         )
 
         return response.text
 
     def generate(self, question: str, context: Optional[str] = None) -> str:
-        if context:
-            prompt = f"""
-You are a helpful assistant.
-Use the following context to answer the question.
+        return self.chat(build_prompt(question, context))
 
-Context:
-{context}
+    async def achat(self, prompt: str) -> str:
+        """Non-blocking chat: awaits the SDK's async client under the concurrency limit."""
+        client = get_llm_client()
 
-Question:
-{question}
-"""
-        else:
-            prompt = question
+        async with get_llm_semaphore():
+            response = await client.aio.models.generate_content(
+                model=DEFAULT_MODEL,
+                contents=prompt,
+            )
+
+        return response.text
+
+    async def agenerate(self, question: str, context: Optional[str] = None) -> str:
+        return await self.achat(build_prompt(question, context))
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        """Yield answer text pieces as Gemini produces them."""
+        client = get_llm_client()
+
+        async with get_llm_semaphore():
+            stream = await client.aio.models.generate_content_stream(
+                model=DEFAULT_MODEL,
+                contents=prompt,
+            )
+            async for chunk in stream:
+                if chunk.text:
+                    yield chunk.text
 
-        return self.chat(prompt)
+    def stream_generate(self, question: str, context: Optional[str] = None) -> AsyncIterator[str]:
+        return self.astream(build_prompt(question, context))
@@ -0,0 +1,48 @@
+# Runs inside ingestion worker processes: keep this module free of torch /
+# Chroma imports so workers start fast and only hold a tokenizer
+from typing import Callable, List, Optional, Tuple
+
+from services.embedding_service import EMBEDDING_MODEL_NAME, tokenizer_spans
+from utils.chunking import estimate_token_spans, iter_chunks
+from utils.log import get_logger
+
+logger = get_logger(__name__)
+
+_token_spans: Optional[Callable[[str], List[Tuple[int, int]]]] = None
+
+
+def init_worker():
+    """Process pool initializer: load the embedding model's tokenizer once"""
+    global _token_spans
+    try:
+        from transformers import AutoTokenizer
+
+        tokenizer = AutoTokenizer.from_pretrained(f"sentence-transformers/{EMBEDDING_MODEL_NAME}")
+        _token_spans = lambda text: tokenizer_spans(tokenizer, text)
+    except Exception as e:
+        logger.warning("⚠️ Tokenizer unavailable in ingestion worker, estimating tokens: %s", e)
+        _token_spans = estimate_token_spans
+
+
+def parse_pdf(path: str, max_tokens: int, overlap_tokens: int) -> Tuple[List[Tuple[str, int]], int]:
+    """
+    Extract and chunk a PDF. Returns ([(chunk, page_index), ...], page_count).
+    """
+    import fitz
+
+    if _token_spans is None:
+        init_worker()
+
+    doc = fitz.open(path)
+    try:
+        pages = [page.get_text() for page in doc]
+    finally:
+        doc.close()
+
+    chunks = list(iter_chunks(
+        pages,
+        max_tokens=max_tokens,
+        overlap_tokens=overlap_tokens,
+        token_spans=_token_spans,
+    ))
+    return chunks, len(pages)
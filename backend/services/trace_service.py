@@ -0,0 +1,160 @@
+import asyncio
+import os
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from utils.log import get_logger
+
+logger = get_logger(__name__)
+
+# One compact row per execution in execution_traces (see GET /api/traces/slowest).
+# Off by default: the table comes from db/migrations/003_execution_traces.sql
+EXECUTION_TRACES = os.getenv("EXECUTION_TRACES", "false").lower() in ("1", "true", "yes")
+# Rows per INSERT, and how often buffered traces are written
+TRACE_BATCH_SIZE = int(os.getenv("TRACE_BATCH_SIZE", "200"))
+TRACE_FLUSH_SECONDS = float(os.getenv("TRACE_FLUSH_SECONDS", "5"))
+# Traces held in memory while the DB is unreachable; the oldest are dropped beyond this
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "10000"))
+
+ERROR_MAX_CHARS = 500
+
+
+class TraceWriter:
+    """
+    Buffers execution traces in memory and inserts them in batches from a
+    background task, so recording a trace never waits on the database.
+    """
+
+    def __init__(self, batch_size: int = TRACE_BATCH_SIZE, interval: float = TRACE_FLUSH_SECONDS,
+                 buffer_size: int = TRACE_BUFFER_SIZE):
+        self.batch_size = batch_size
+        self.interval = interval
+        self._buffer: deque = deque(maxlen=buffer_size)
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self.written = 0
+        self.dropped = 0
+        self.failed_flushes = 0
+
+    def record(self, trace: Dict):
+        if len(self._buffer) == self._buffer.maxlen:
+            self.dropped += 1
+        self._buffer.append(trace)
+        if self._wakeup is not None and len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    def start(self):
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._flush_lock = asyncio.Lock()
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Write everything buffered so far (also used before reading traces)"""
+        if not self._buffer:
+            return
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+
+        async with self._flush_lock:
+            while self._buffer:
+                batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+                if not await self._insert(batch):
+                    self._requeue(batch)
+                    return
+                self.written += len(batch)
+
+    def _requeue(self, batch: List[Dict]):
+        """Put a failed batch back in front for the next attempt, dropping the oldest if full"""
+        overflow = len(self._buffer) + len(batch) - self._buffer.maxlen
+        if overflow > 0:
+            self.dropped += overflow
+            batch = batch[overflow:]
+        self._buffer.extendleft(reversed(batch))
+
+    async def _insert(self, batch: List[Dict]) -> bool:
+        try:
+            from sqlalchemy import insert
+            from db.models.execution_trace import ExecutionTrace
+            from db.session import get_async_sessionmaker
+
+            async with get_async_sessionmaker()() as db:
+                await db.execute(insert(ExecutionTrace), batch)
+                await db.commit()
+            return True
+        except Exception as e:
+            self.failed_flushes += 1
+            logger.warning("⚠️ Failed to write %s execution traces: %s", len(batch), e)
+            return False
+
+    async def aclose(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": EXECUTION_TRACES,
+            "buffered": len(self._buffer),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed_flushes": self.failed_flushes,
+        }
+
+
+_trace_writer = None
+
+def get_trace_writer() -> TraceWriter:
+    global _trace_writer
+    if _trace_writer is None:
+        _trace_writer = TraceWriter()
+    return _trace_writer
+
+
+def record_trace(
+    *,
+    workflow_id: Optional[str],
+    content_hash: str,
+    mode: str,
+    total_ms: float,
+    nodes: Dict[str, Dict],
+    chunks_used: int = 0,
+    prompt_chars: Optional[int] = None,
+    answer_chars: Optional[int] = None,
+    cache_hit: Optional[str] = None,
+    error: Optional[str] = None,
+):
+    """Queue one execution trace (no-op unless EXECUTION_TRACES)"""
+    if not EXECUTION_TRACES:
+        return
+    get_trace_writer().record({
+        "workflow_id": workflow_id,
+        "content_hash": content_hash,
+        "mode": mode,
+        "total_ms": round(total_ms, 2),
+        "success": error is None,
+        "error": error[:ERROR_MAX_CHARS] if error else None,
+        "chunks_used": chunks_used,
+        "prompt_chars": prompt_chars,
+        "answer_chars": answer_chars,
+        "cache_hit": cache_hit,
+        "nodes": nodes,
+        # Run time, not flush time
+        "created_at": datetime.now(timezone.utc),
+    })
@@ -1,69 +1,365 @@
-import chromadb
-from chromadb.config import Settings
+import asyncio
+import hashlib
 import os
+import re
 import shutil
+import threading
 import uuid
-from typing import List
+from collections import defaultdict
+from typing import Dict, List, Optional
+from services.bm25_index import BM25Index, reciprocal_rank_fusion
+from utils.log import get_logger
+
+logger = get_logger(__name__)
+
+# Namespace used by workflows whose knowledgeBase node doesn't pick one;
+# maps to the original single "documents" collection
+DEFAULT_NAMESPACE = "documents"
+
+# Query embeddings per Chroma call in similarity_search_many (batch executions)
+SEARCH_MANY_BATCH = int(os.getenv("SEARCH_MANY_BATCH", "256"))
+
+_NAMESPACE_RE = re.compile(r"^[A-Za-z0-9](?:[A-Za-z0-9_-]{0,58}[A-Za-z0-9])?$")
+
+
+def document_id_for(filename: str) -> str:
+    """Stable id for a document: the same filename always maps to the same id"""
+    return "doc_" + hashlib.sha1(filename.encode("utf-8")).hexdigest()[:16]
+
+
+def chunk_id_for(document_id: str, chunk_index: int) -> str:
+    return f"{document_id}:{chunk_index}"
+
+
+def resolve_namespace(namespace: Optional[str]) -> str:
+    namespace = (namespace or DEFAULT_NAMESPACE).strip()
+    if not _NAMESPACE_RE.match(namespace):
+        raise ValueError(
+            f"Invalid knowledge base namespace '{namespace}': "
+            "use 1-60 letters, digits, '-' or '_'"
+        )
+    return namespace
+
+
+def collection_name_for(namespace: str) -> str:
+    if namespace == DEFAULT_NAMESPACE:
+        return DEFAULT_NAMESPACE
+    return f"kb_{namespace}"
+
 
 class VectorStoreService:
+    """
+    Chroma-backed store with one collection per knowledge base namespace,
+    so each workflow searches (and overwrites) only its own corpus.
+    """
+
     def __init__(self):
         self.persist_dir = os.getenv("CHROMA_PERSIST_DIR", "./chroma_data")
+        # Bumped on every write so caches built on search results can tell they're stale
+        self._versions: Dict[str, int] = defaultdict(int)
+        self._collections = {}
+        self._bm25 = {}
+        # Namespaces already checked for pre-upsert chunks this process
+        self._legacy_checked = set()
+        self._lock = threading.Lock()
         self._init_client()
 
     def _init_client(self):
+        # Imported here so loading the app doesn't pay for chromadb
+        import chromadb
+        from chromadb.config import Settings
+
         self.client = chromadb.PersistentClient(
             path=self.persist_dir,
             settings=Settings(anonymized_telemetry=False)
         )
-        self.collection = self.client.get_or_create_collection(
-            name="documents",
-            metadata={"hnsw:space": "cosine"}
-        )
-        print(f"📦 ChromaDB initialized at {self.persist_dir}")
+        logger.info("📦 ChromaDB initialized at %s", self.persist_dir)
 
-    def clear_collection(self):
-        self.client.delete_collection("documents")
-        self.collection = self.client.get_or_create_collection(
-            name="documents",
-            metadata={"hnsw:space": "cosine"}
-        )
-        print("🧹 ChromaDB collection cleared")
+    def get_collection(self, namespace: Optional[str] = None, create: bool = False):
+        """
+        The namespace's collection. Only writes pass create=True; for reads a
+        namespace that was never written returns None, so a mistyped
+        namespace doesn't leave an empty collection behind.
+        """
+        namespace = resolve_namespace(namespace)
+        collection = self._collections.get(namespace)
+        if collection is None:
+            with self._lock:
+                collection = self._collections.get(namespace)
+                if collection is None:
+                    if create:
+                        collection = self.client.get_or_create_collection(
+                            name=collection_name_for(namespace),
+                            metadata={"hnsw:space": "cosine"}
+                        )
+                    else:
+                        try:
+                            collection = self.client.get_collection(name=collection_name_for(namespace))
+                        except Exception:
+                            # Not found (the exception type differs between chromadb versions)
+                            return None
+                    self._collections[namespace] = collection
+        return collection
+
+    def bm25(self, namespace: Optional[str] = None) -> BM25Index:
+        """Keyword index kept in step with the namespace's collection"""
+        namespace = resolve_namespace(namespace)
+        index = self._bm25.get(namespace)
+        if index is None:
+            with self._lock:
+                index = self._bm25.get(namespace)
+                if index is None:
+                    os.makedirs(self.persist_dir, exist_ok=True)
+                    index = BM25Index(os.path.join(self.persist_dir, f"bm25_{namespace}.sqlite"))
+                    self._bm25[namespace] = index
+        return index
+
+    def version(self, namespace: Optional[str] = None) -> int:
+        return self._versions[resolve_namespace(namespace)]
+
+    def _touch(self, namespace: Optional[str]):
+        self._versions[resolve_namespace(namespace)] += 1
+
+    def list_namespaces(self) -> List[str]:
+        names = []
+        for collection in self.client.list_collections():
+            name = getattr(collection, "name", collection)
+            if name == DEFAULT_NAMESPACE:
+                names.append(name)
+            elif name.startswith("kb_"):
+                names.append(name[3:])
+        return names
 
+    def clear_collection(self, namespace: Optional[str] = None):
+        namespace = resolve_namespace(namespace)
+        with self._lock:
+            try:
+                self.client.delete_collection(collection_name_for(namespace))
+            except Exception:
+                pass  # nothing stored in this namespace yet
+            self._collections.pop(namespace, None)
+        self.bm25(namespace).clear()
+        self._touch(namespace)
+        logger.info("🧹 ChromaDB collection '%s' cleared", namespace)
 
-    def add_text(self, texts: List[str], embeddings: List[List[float]], metadatas: List[dict]):
-        ids = [str(uuid.uuid4()) for _ in texts]
-        self.collection.add(
+
+    def add_text(
+        self,
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadatas: List[dict],
+        ids: Optional[List[str]] = None,
+        namespace: Optional[str] = None,
+    ):
+        if ids is None:
+            ids = [str(uuid.uuid4()) for _ in texts]
+        if resolve_namespace(namespace) not in self._legacy_checked:
+            self._legacy_checked.add(resolve_namespace(namespace))
+            self.purge_legacy_chunks(namespace)
+        # upsert: re-ingesting a document overwrites its chunks in place
+        self.get_collection(namespace, create=True).upsert(
             ids=ids,
             documents=texts,
             embeddings=embeddings,
             metadatas=metadatas
         )
-        print(f"✅ Added {len(texts)} vectors")
+        self.bm25(namespace).add(ids, texts, metadatas)
+        self._touch(namespace)
+        logger.debug("✅ Added %s vectors", len(texts))
+
+    def purge_legacy_chunks(self, namespace: Optional[str] = None) -> int:
+        """
+        Delete chunks stored before documents had ids (random uuid ids, no
+        document_id). Uploads used to replace the whole collection, so they
+        are a stale copy of some file; nothing can list, delete or replace
+        them by id. Runs on the first write to a namespace; returns the
+        number of chunks removed.
+        """
+        collection = self.get_collection(namespace)
+        if collection is None:
+            return 0
+
+        heads = collection.get(where={"chunk_index": 0}, include=["metadatas"])["metadatas"]
+        filenames = {m.get("filename") for m in heads if not m.get("document_id") and m.get("filename")}
+
+        legacy_ids = []
+        for filename in filenames:
+            found = collection.get(where={"filename": filename}, include=["metadatas"])
+            legacy_ids += [i for i, m in zip(found["ids"], found["metadatas"]) if not m.get("document_id")]
+
+        if legacy_ids:
+            collection.delete(ids=legacy_ids)
+            self._touch(namespace)
+            logger.info("🧹 Removed %s legacy chunks from '%s'", len(legacy_ids), resolve_namespace(namespace))
+        return len(legacy_ids)
+
+    def get_document(self, document_id: str, namespace: Optional[str] = None) -> Optional[dict]:
+        """
+        Head-chunk metadata for a document (carries filename, content_hash,
+        total_chunks and the complete flag), or None if not stored.
+        """
+        collection = self.get_collection(namespace)
+        if collection is None:
+            return None
+        result = collection.get(
+            ids=[chunk_id_for(document_id, 0)],
+            include=["metadatas"]
+        )
+        return result["metadatas"][0] if result["ids"] else None
+
+    def list_documents(self, namespace: Optional[str] = None) -> List[dict]:
+        collection = self.get_collection(namespace)
+        if collection is None:
+            return []
+        result = collection.get(
+            where={"chunk_index": 0},
+            include=["metadatas"]
+        )
+        return result["metadatas"]
+
+    def mark_document_complete(self, document_id: str, total_chunks: int, namespace: Optional[str] = None):
+        head = self.get_document(document_id, namespace)
+        if head is None:
+            return
+        self.get_collection(namespace).update(
+            ids=[chunk_id_for(document_id, 0)],
+            metadatas=[{**head, "total_chunks": total_chunks, "complete": True}]
+        )
 
-    def similarity_search(self, query_embedding: List[float], k: int = 5):
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=k,
-            include=["documents", "metadatas", "distances"]
+    def delete_document(self, document_id: str, from_chunk: int = 0, namespace: Optional[str] = None):
+        """
+        Delete a document's chunks; with from_chunk > 0 only the tail is removed
+        (used to trim leftovers when a new version has fewer chunks).
+        """
+        collection = self.get_collection(namespace)
+        if collection is None:
+            return
+
+        where = {"document_id": document_id}
+        if from_chunk:
+            where = {"$and": [where, {"chunk_index": {"$gte": from_chunk}}]}
+
+        collection.delete(where=where)
+        self.bm25(namespace).delete_document(document_id, from_chunk)
+        self._touch(namespace)
+        logger.info("🗑️ Deleted chunks of %s from #%s", document_id, from_chunk)
+
+    def similarity_search(self, query_embedding: List[float], k: int = 5, namespace: Optional[str] = None):
+        documents = self.similarity_search_many([query_embedding], k=k, namespace=namespace)[0]
+        logger.debug("🔍 Found %s documents in '%s'", len(documents), resolve_namespace(namespace))
+        return documents
+
+    def similarity_search_many(
+        self,
+        query_embeddings: List[List[float]],
+        k: int = 5,
+        namespace: Optional[str] = None,
+    ) -> List[List[dict]]:
+        """
+        Chroma queries for many embeddings, SEARCH_MANY_BATCH per call;
+        results per query, in order
+        """
+        collection = self.get_collection(namespace)
+        if collection is None:
+            return [[] for _ in query_embeddings]
+
+        found = []
+        for start in range(0, len(query_embeddings), SEARCH_MANY_BATCH):
+            results = collection.query(
+                query_embeddings=query_embeddings[start:start + SEARCH_MANY_BATCH],
+                n_results=k,
+                include=["documents", "metadatas", "distances"]
+            )
+            found.extend(
+                [
+                    {
+                        "id": results["ids"][q][i],
+                        "text": doc,
+                        "metadata": results["metadatas"][q][i],
+                        "score": results["distances"][q][i]
+                    }
+                    for i, doc in enumerate(docs)
+                ]
+                for q, docs in enumerate(results["documents"])
+            )
+        return found
+
+    def get_by_ids(self, ids: List[str], namespace: Optional[str] = None) -> List[dict]:
+        collection = self.get_collection(namespace) if ids else None
+        if collection is None:
+            return []
+        results = collection.get(
+            ids=ids,
+            include=["documents", "metadatas"]
         )
+        return [
+            {"id": chunk_id, "text": doc, "metadata": metadata}
+            for chunk_id, doc, metadata in zip(results["ids"], results["documents"], results["metadatas"])
+        ]
+
+    def keyword_search(self, query: str, k: int = 5, namespace: Optional[str] = None) -> List[dict]:
+        """BM25 search; results have the same shape as similarity_search"""
+        if self.get_collection(namespace) is None:
+            return []
+        hits = self.bm25(namespace).search(query, k)
+        found = {d["id"]: d for d in self.get_by_ids([chunk_id for chunk_id, _ in hits], namespace)}
+        return [
+            {**found[chunk_id], "score": score}
+            for chunk_id, score in hits
+            if chunk_id in found
+        ]
+
+    def hybrid_search(
+        self,
+        query: str,
+        query_embedding: List[float],
+        k: int = 5,
+        candidates: int = 20,
+        namespace: Optional[str] = None,
+    ) -> List[dict]:
+        """
+        Vector + BM25 candidates merged with reciprocal rank fusion.
+        score is the fused RRF score (higher is better).
+        """
+        if self.get_collection(namespace) is None:
+            return []
+        dense = self.similarity_search(query_embedding, k=candidates, namespace=namespace)
+        sparse = self.bm25(namespace).search(query, candidates)
+
+        fused = reciprocal_rank_fusion([
+            [d["id"] for d in dense],
+            [chunk_id for chunk_id, _ in sparse],
+        ])[:k]
 
-        documents = []
-        for i, doc in enumerate(results["documents"][0]):
-            documents.append({
-                "text": doc,
-                "metadata": results["metadatas"][0][i],
-                "score": results["distances"][0][i]
-            })
+        by_id = {d["id"]: d for d in dense}
+        missing = [chunk_id for chunk_id, _ in fused if chunk_id not in by_id]
+        by_id.update({d["id"]: d for d in self.get_by_ids(missing, namespace)})
 
-        print(f"🔍 Found {len(documents)} documents")
+        documents = [
+            {**by_id[chunk_id], "score": score}
+            for chunk_id, score in fused
+            if chunk_id in by_id
+        ]
+        logger.debug("🔀 Hybrid search kept %s of %s dense + %s keyword hits", len(documents), len(dense), len(sparse))
         return documents
 
 _vector_store = None
+_vector_store_lock = threading.Lock()
 
 def get_vector_store():
     global _vector_store
     if _vector_store is None:
-        print("🚀 Initializing Chroma lazily")
-        _vector_store = VectorStoreService()
+        with _vector_store_lock:
+            if _vector_store is None:
+                logger.info("🚀 Initializing Chroma lazily")
+                _vector_store = VectorStoreService()
     return _vector_store
 
+async def aget_vector_store():
+    """
+    get_vector_store for async handlers: a cold store (chromadb import,
+    PersistentClient open) is created in a worker thread, not on the loop
+    """
+    if _vector_store is not None:
+        return _vector_store
+    return await asyncio.to_thread(get_vector_store)
@@ -0,0 +1,98 @@
+import asyncio
+import os
+import time
+from typing import Dict, Optional
+from utils.log import get_logger
+
+logger = get_logger(__name__)
+
+# Load the embedding model, open Chroma and create the LLM client in the
+# background at startup instead of on the first request
+STARTUP_PREWARM = os.getenv("STARTUP_PREWARM", "false").lower() in ("1", "true", "yes")
+
+
+class Readiness:
+    """What the background prewarm has finished, for GET /ready"""
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.components: Dict[str, Dict] = {}
+        self.done = False
+        self.task: Optional[asyncio.Task] = None
+
+    def mark(self, name: str, ok: bool, seconds: float, error: Optional[str] = None):
+        self.components[name] = {"ok": ok, "seconds": round(seconds, 3), "error": error}
+
+    @property
+    def ready(self) -> bool:
+        return self.done and all(c["ok"] for c in self.components.values())
+
+    def status(self) -> dict:
+        return {
+            "ready": self.ready,
+            "prewarm": STARTUP_PREWARM,
+            "uptime_seconds": round(time.monotonic() - self.started_at, 3),
+            "components": self.components,
+        }
+
+
+def _embedding_model():
+    from services.embedding_service import get_embedding_model, encode_queries
+
+    get_embedding_model()
+    # One dummy encode: first forward pass allocates buffers / compiles kernels
+    encode_queries(["warm up"])
+
+
+def _vector_store():
+    from services.vector_store_service import get_vector_store
+
+    get_vector_store().get_collection()
+
+
+def _llm_client():
+    if not os.getenv("GOOGLE_API_KEY"):
+        return  # nothing to warm; LLM nodes report the missing key themselves
+
+    from services.llm_service import get_llm_client
+
+    get_llm_client()
+
+
+PREWARM_STEPS = {
+    "embedding_model": _embedding_model,
+    "vector_store": _vector_store,
+    "llm_client": _llm_client,
+}
+
+
+async def prewarm(readiness: Readiness):
+    for name, step in PREWARM_STEPS.items():
+        start = time.perf_counter()
+        try:
+            await asyncio.to_thread(step)
+            readiness.mark(name, True, time.perf_counter() - start)
+            logger.info("🔥 Prewarmed %s in %.2fs", name, time.perf_counter() - start)
+        except Exception as e:
+            readiness.mark(name, False, time.perf_counter() - start, str(e))
+            logger.warning("⚠️ Prewarm of %s failed: %s", name, e)
+    readiness.done = True
+
+
+_readiness = None
+
+def get_readiness() -> Readiness:
+    global _readiness
+    if _readiness is None:
+        _readiness = Readiness()
+    return _readiness
+
+
+def start_prewarm() -> Readiness:
+    """Kick off the prewarm in the background (no-op unless STARTUP_PREWARM)"""
+    readiness = get_readiness()
+    if STARTUP_PREWARM:
+        readiness.task = asyncio.create_task(prewarm(readiness))
+    else:
+        readiness.done = True
+    return readiness
@@ -1,79 +1,240 @@
+import asyncio
 import os
-import requests
+from typing import Dict, List, Optional, Tuple
+import httpx
+
+from utils.cache import TTLCache
+from utils.rate_limit import AsyncRateLimiter
+from utils.singleflight import SingleFlight
+from utils.log import get_logger
+from utils.metrics import cache_event
+
+logger = get_logger(__name__)
+
+# Shared HTTP client (connection pool + keep-alive across searches)
+WEB_SEARCH_TIMEOUT = float(os.getenv("WEB_SEARCH_TIMEOUT", "10"))
+WEB_SEARCH_MAX_CONNECTIONS = int(os.getenv("WEB_SEARCH_MAX_CONNECTIONS", "20"))
+
+# Result cache, keyed by (provider, query, max_results)
+WEB_SEARCH_CACHE_SIZE = int(os.getenv("WEB_SEARCH_CACHE_SIZE", "2048"))
+WEB_SEARCH_CACHE_TTL = float(os.getenv("WEB_SEARCH_CACHE_TTL", "900"))
+
+# Upper bound on results per search, whatever a workflow node asks for
+# (paid providers bill by result page; the UI offers 1-20)
+WEB_SEARCH_RESULTS_LIMIT = int(os.getenv("WEB_SEARCH_RESULTS_LIMIT", "20"))
+
+# Explicit provider (serpapi | brave | stub); otherwise picked from the API keys.
+# The offline stub is only available when selected here, never per node
+WEB_SEARCH_PROVIDER = os.getenv("WEB_SEARCH_PROVIDER")
+
+
+class SearchProvider:
+    name = "base"
+    # Requests per second allowed by the provider's plan (0 = unlimited)
+    default_rate = 0.0
+
+    def __init__(self):
+        # e.g. WEB_SEARCH_BRAVE_RATE=1, WEB_SEARCH_BRAVE_BURST=1
+        rate = float(os.getenv(f"WEB_SEARCH_{self.name.upper()}_RATE", str(self.default_rate)))
+        burst = int(os.getenv(f"WEB_SEARCH_{self.name.upper()}_BURST", "1"))
+        self.limiter = AsyncRateLimiter(rate, burst)
+
+    async def search(self, client: httpx.AsyncClient, query: str, max_results: int) -> List[Dict]:
+        """Results as [{title, snippet, url}]"""
+        raise NotImplementedError
+
+
+class SerpApiProvider(SearchProvider):
+    name = "serpapi"
+    default_rate = 5.0
+
+    def __init__(self, api_key: str):
+        super().__init__()
+        self.api_key = api_key
+
+    async def search(self, client: httpx.AsyncClient, query: str, max_results: int) -> List[Dict]:
+        response = await client.get(
+            "https://serpapi.com/search",
+            params={"q": query, "api_key": self.api_key, "num": max_results},
+        )
+        response.raise_for_status()
+        return [
+            {"title": r.get("title"), "snippet": r.get("snippet"), "url": r.get("link")}
+            for r in response.json().get("organic_results", [])[:max_results]
+        ]
+
+
+class BraveProvider(SearchProvider):
+    name = "brave"
+    default_rate = 1.0
+
+    def __init__(self, api_key: str):
+        super().__init__()
+        self.api_key = api_key
+
+    async def search(self, client: httpx.AsyncClient, query: str, max_results: int) -> List[Dict]:
+        response = await client.get(
+            "https://api.search.brave.com/res/v1/web/search",
+            headers={"Accept": "application/json", "X-Subscription-Token": self.api_key},
+            params={"q": query, "count": max_results},
+        )
+        response.raise_for_status()
+        return [
+            {"title": r.get("title"), "snippet": r.get("description"), "url": r.get("url")}
+            for r in response.json().get("web", {}).get("results", [])[:max_results]
+        ]
+
+
+class StubProvider(SearchProvider):
+    """Deterministic offline results, for tests and local development"""
+    name = "stub"
+
+    async def search(self, client: httpx.AsyncClient, query: str, max_results: int) -> List[Dict]:
+        return [
+            {
+                "title": f"Result {i + 1} for {query}",
+                "snippet": f"Stub snippet {i + 1} about {query}.",
+                "url": f"https://example.com/search/{i + 1}",
+            }
+            for i in range(max_results)
+        ]
+
+
+def _clamp(max_results) -> int:
+    return max(1, min(int(max_results), WEB_SEARCH_RESULTS_LIMIT))
+
+
+def _cache_key(provider: str, query: str, max_results: int) -> Tuple:
+    return provider, " ".join(query.lower().split()), max_results
+
+
+def format_results(results: List[Dict]) -> str:
+    return "\n\n".join(
+        f"Title: {r.get('title')}\n{r.get('snippet')}\nURL: {r.get('url')}"
+        for r in results
+    )
+
 
 class WebSearchService:
     def __init__(self):
         # Try SerpAPI first, fallback to Brave
         self.serp_api_key = os.getenv("SERPAPI_KEY")
         self.brave_api_key = os.getenv("BRAVE_API_KEY")
-        
-        if self.serp_api_key:
+        self._providers: Dict[str, SearchProvider] = {}
+        self._cache = TTLCache(maxsize=WEB_SEARCH_CACHE_SIZE, ttl=WEB_SEARCH_CACHE_TTL)
+        self._inflight = SingleFlight()
+        self._client: Optional[httpx.AsyncClient] = None
+
+        if WEB_SEARCH_PROVIDER:
+            self.provider = WEB_SEARCH_PROVIDER
+        elif self.serp_api_key:
             self.provider = "serpapi"
         elif self.brave_api_key:
             self.provider = "brave"
         else:
             self.provider = None
-            print("⚠️ No web search API key found")
-    
+            logger.warning("⚠️ No web search API key found")
+
+    def get_provider(self, name: Optional[str] = None) -> Optional[SearchProvider]:
+        name = name or self.provider
+        if not name:
+            return None
+
+        provider = self._providers.get(name)
+        if provider is None:
+            if name == "serpapi" and self.serp_api_key:
+                provider = SerpApiProvider(self.serp_api_key)
+            elif name == "brave" and self.brave_api_key:
+                provider = BraveProvider(self.brave_api_key)
+            elif name == "stub" and WEB_SEARCH_PROVIDER == "stub":
+                provider = StubProvider()
+            else:
+                raise ValueError(f"Web search provider '{name}' is not configured")
+            self._providers[name] = provider
+        return provider
+
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=WEB_SEARCH_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=WEB_SEARCH_MAX_CONNECTIONS,
+                    max_keepalive_connections=WEB_SEARCH_MAX_CONNECTIONS,
+                ),
+            )
+        return self._client
+
+    async def asearch(self, query: str, max_results: int = 5, provider: Optional[str] = None) -> List[Dict]:
+        """
+        Search the web; identical searches within the TTL (or already in
+        flight) reuse the same provider call.
+        """
+        search_provider = self.get_provider(provider)
+        if search_provider is None:
+            return []
+        max_results = _clamp(max_results)
+
+        key = _cache_key(search_provider.name, query, max_results)
+        results = self._cache.get(key)
+        cache_event("web_search", results is not None)
+        if results is not None:
+            return results
+
+        async def fetch():
+            async with search_provider.limiter:
+                found = await search_provider.search(self.client(), query, max_results)
+            self._cache.set(key, found)
+            return found
+
+        results, _ = await self._inflight.do(key, fetch)
+        return results
+
     def search(self, query: str, max_results: int = 5) -> str:
-        """Perform web search and return formatted results"""
-        
+        """
+        Perform web search and return formatted results (blocking; async
+        code uses asearch). Shares the result cache, but not the pooled
+        client, rate limiter or coalescing, which belong to the server's
+        event loop.
+        """
         if not self.provider:
             return "Web search not configured."
-        
-        if self.provider == "serpapi":
-            return self._search_serpapi(query, max_results)
-        else:
-            return self._search_brave(query, max_results)
-    
-    def _search_serpapi(self, query: str, max_results: int) -> str:
-        """Search using SerpAPI"""
-        url = "https://serpapi.com/search"
-        params = {
-            "q": query,
-            "api_key": self.serp_api_key,
-            "num": max_results
-        }
-        
+
         try:
-            response = requests.get(url, params=params, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                results = data.get("organic_results", [])
-                
-                formatted = []
-                for r in results[:max_results]:
-                    formatted.append(f"Title: {r.get('title')}\n{r.get('snippet')}\nURL: {r.get('link')}")
-                
-                return "\n\n".join(formatted)
-            else:
-                return "Web search failed."
+            return format_results(asyncio.run(self._search_blocking(query, max_results)))
         except Exception as e:
-            print(f"SerpAPI error: {e}")
+            logger.warning("⚠️ %s search error: %s", self.provider, e)
             return "Web search error."
-    
-    def _search_brave(self, query: str, max_results: int) -> str:
-        """Search using Brave Search API"""
-        url = "https://api.search.brave.com/res/v1/web/search"
-        headers = {
-            "Accept": "application/json",
-            "X-Subscription-Token": self.brave_api_key
+
+    async def _search_blocking(self, query: str, max_results: int) -> List[Dict]:
+        search_provider = self.get_provider()
+        max_results = _clamp(max_results)
+        key = _cache_key(search_provider.name, query, max_results)
+        results = self._cache.get(key)
+        cache_event("web_search", results is not None)
+        if results is None:
+            async with httpx.AsyncClient(timeout=WEB_SEARCH_TIMEOUT) as client:
+                results = await search_provider.search(client, query, max_results)
+            self._cache.set(key, results)
+        return results
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> dict:
+        return {
+            "provider": self.provider,
+            "cache": self._cache.stats(),
+            "in_flight": self._inflight.stats(),
+            "rate_limits": {name: p.limiter.stats() for name, p in self._providers.items()},
         }
-        params = {"q": query, "count": max_results}
-        
-        try:
-            response = requests.get(url, headers=headers, params=params, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                results = data.get("web", {}).get("results", [])
-                
-                formatted = []
-                for r in results:
-                    formatted.append(f"Title: {r.get('title')}\n{r.get('description')}\nURL: {r.get('url')}")
-                
-                return "\n\n".join(formatted)
-            else:
-                return "Web search failed."
-        except Exception as e:
-            print(f"Brave API error: {e}")
-            return "Web search error."
\ No newline at end of file
+
+
+_web_search = None
+
+def get_web_search_service() -> WebSearchService:
+    global _web_search
+    if _web_search is None:
+        _web_search = WebSearchService()
+    return _web_search
@@ -1,107 +1,637 @@
-from typing import List, Dict, Optional
-from services.embedding_service import get_embedding_model
-from services.vector_store_service import get_vector_store
-from services.llm_service import LLMService
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Awaitable, Callable, List, Dict, Mapping, Optional, Set, Tuple
+from core.workflow_compiler import CompiledWorkflow, compile_workflow
+from services.embedding_service import EmbeddingService, normalize_query
+from services.vector_store_service import aget_vector_store, resolve_namespace
+from services.llm_service import LLMService, build_prompt
+from services.answer_cache import ANSWER_CACHE_ENABLED, get_answer_cache
+from services.web_search_service import format_results, get_web_search_service
+from services.trace_service import record_trace
+from utils.singleflight import SingleFlight
+from utils.log import get_logger
+from utils.metrics import CACHE_EVENTS, WORKFLOW_SECONDS, observe
 
+logger = get_logger(__name__)
 
-def find_node_by_type(nodes: List[Dict], node_type: str) -> Optional[Dict]:
-    for node in nodes:
-        if node.get("type") == node_type:
-            return node
-    return None
+# Default retrieval for knowledgeBase nodes that don't set data.retrieval:
+# "vector" (cosine only) or "hybrid" (cosine + BM25, reciprocal rank fusion)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "vector")
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "5"))
+WEB_SEARCH_MAX_RESULTS = int(os.getenv("WEB_SEARCH_MAX_RESULTS", "5"))
 
+# Queries of one batch executed at the same time (LLM calls are also
+# bounded globally by LLM_MAX_CONCURRENCY)
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
 
-async def execute_workflow(query: str, nodes: List[Dict], edges: List[Dict]) -> Dict:
-    print(f"\n🟢 ===== WORKFLOW EXECUTION START =====")
-    print(f"Query: {query}")
+# Identical executions already in flight share one pipeline run
+_executions = SingleFlight()
 
-    user_query_node = find_node_by_type(nodes, "userQuery")
-    kb_node = find_node_by_type(nodes, "knowledgeBase")
-    llm_node = find_node_by_type(nodes, "llmEngine")
-    output_node = find_node_by_type(nodes, "output")
 
-    if not user_query_node:
-        raise ValueError("User Query component not found")
-    if not llm_node:
-        raise ValueError("LLM Engine component not found")
-    if not output_node:
-        raise ValueError("Output component not found")
+def get_execution_singleflight() -> SingleFlight:
+    return _executions
 
-    print("✅ All required components found")
 
-    # --------------------------------------------------
-    # Step 1: Knowledge Base (LAZY)
-    # --------------------------------------------------
-    context = None
-    sources = []
+def _dump_plan(plan: CompiledWorkflow) -> str:
+    return " → ".join(plan.node_ids[s] for s in plan.order)
 
-    if kb_node:
-        print("\n🟡 Step 1: Knowledge Base Component")
 
-        try:
-            print("  - Loading embedding model lazily")
-            embedding_model = get_embedding_model()
-
-            print("  - Loading vector store lazily")
-            vector_store = get_vector_store()
-
-            print("  - Generating query embedding")
-            query_embedding = embedding_model.encode(
-                query,
-                convert_to_numpy=True,
-                normalize_embeddings=True,
-            ).tolist()
-
-            print("  - Searching vector store")
-            results = vector_store.similarity_search(
-                query_embedding=query_embedding,
-                k=5,
-            )
-
-            if results:
-                context = "\n\n".join(r["text"] for r in results)
-                sources = [r["metadata"] for r in results]
-                print(f"  ✅ Retrieved {len(results)} chunks")
+# --------------------------------------------------
+# Node handlers
+#
+# Each handler gets the run context, the node and the outputs of its
+# upstream nodes, and returns its own output dict. Outputs may carry:
+#   query       - the question flowing through the graph
+#   results     - retrieved chunks ({id, text, metadata, score})
+#   namespaces  - KB namespaces the results came from
+#   answer      - generated text
+# --------------------------------------------------
+
+@dataclass
+class RunContext:
+    query: str
+    workflow_id: Optional[str] = None
+    timings: Dict[str, Dict] = field(default_factory=dict)
+    cache_hits: Dict[str, Optional[str]] = field(default_factory=dict)
+    # node id -> sizes for the execution trace (chunks, prompt_chars, answer_chars)
+    node_stats: Dict[str, Dict] = field(default_factory=dict)
+    # knowledgeBase node id -> results already retrieved for ctx.query (batch mode)
+    prefetched: Dict[str, List[Dict]] = field(default_factory=dict)
+
+
+def _merge_inputs(ctx: RunContext, inputs: List[Dict]) -> Dict:
+    query = next((i["query"] for i in inputs if i.get("query")), ctx.query)
+
+    results, seen = [], set()
+    for i in inputs:
+        for r in i.get("results", []):
+            if r["id"] not in seen:
+                seen.add(r["id"])
+                results.append(r)
+
+    namespaces = sorted({ns for i in inputs for ns in i.get("namespaces", [])})
+    answers = [i["answer"] for i in inputs if i.get("answer")]
+
+    return {"query": query, "results": results, "namespaces": namespaces, "answers": answers}
+
+
+def _context(results: List[Dict], answers: Optional[List[str]] = None) -> Optional[str]:
+    parts = [r["text"] for r in results] + list(answers or [])
+    if not parts:
+        return None
+    return "\n\n".join(parts)
+
+
+async def run_user_query(ctx: RunContext, node: Mapping, inputs: List[Dict]) -> Dict:
+    return {"query": ctx.query}
+
+
+def _kb_settings(node: Mapping) -> Tuple[str, str, int]:
+    """(namespace, retrieval mode, top_k) of a knowledgeBase node"""
+    kb_config = node["data"]
+    # Each knowledgeBase node searches its own namespace (raises ValueError if invalid)
+    namespace = resolve_namespace(kb_config.get("namespace"))
+    mode = kb_config.get("retrieval") or RETRIEVAL_MODE
+    top_k = int(kb_config.get("top_k") or RETRIEVAL_TOP_K)
+    return namespace, mode, top_k
+
+
+async def _retrieve(query: str, namespace: str, mode: str, top_k: int) -> List[Dict]:
+    results = []
+    try:
+        vector_store = await aget_vector_store()
+        query_embedding = await EmbeddingService().aembed_query(query)
+
+        with observe("vector_search"):
+            if mode == "hybrid":
+                results = await asyncio.to_thread(
+                    vector_store.hybrid_search,
+                    query=query,
+                    query_embedding=query_embedding,
+                    k=top_k,
+                    namespace=namespace,
+                )
             else:
-                print("  ⚠️ No KB results found")
+                results = await asyncio.to_thread(
+                    vector_store.similarity_search,
+                    query_embedding=query_embedding,
+                    k=top_k,
+                    namespace=namespace,
+                )
 
-        except Exception as e:
-            print(f"  ⚠️ Knowledge Base failed: {e}")
+        if results:
+            logger.debug("Retrieved %d chunks", len(results))
+        else:
+            logger.debug("No KB results found")
+
+    except Exception as e:
+        logger.warning("⚠️ Knowledge Base failed: %s", e)
+
+    return results
+
+
+async def run_knowledge_base(ctx: RunContext, node: Mapping, inputs: List[Dict]) -> Dict:
+    merged = _merge_inputs(ctx, inputs)
+    query = merged["query"]
+
+    namespace, mode, top_k = _kb_settings(node)
+    logger.debug("Knowledge Base %s (namespace '%s', %s)", node["id"], namespace, mode)
 
+    results = ctx.prefetched.get(node["id"])
+    if results is not None and query == ctx.query:
+        logger.debug("Using %d prefetched chunks", len(results))
     else:
-        print("\n⚪ Knowledge Base not in workflow — skipped")
+        results = await _retrieve(query, namespace, mode, top_k)
 
-    # --------------------------------------------------
-    # Step 2: LLM Engine (LAZY CLIENT)
-    # --------------------------------------------------
-    print("\n🟡 Step 2: LLM Engine Component")
+    ctx.node_stats[node["id"]] = {"chunks": len(results)}
+    return {
+        "query": query,
+        "results": merged["results"] + results,
+        "namespaces": sorted(set(merged["namespaces"]) | {namespace}),
+    }
+
+
+async def run_web_search(ctx: RunContext, node: Mapping, inputs: List[Dict]) -> Dict:
+    merged = _merge_inputs(ctx, inputs)
+    query = merged["query"]
 
-    llm_service = LLMService()
-    llm_config = llm_node.get("data", {})
+    config = node["data"]
+    max_results = int(config.get("max_results") or WEB_SEARCH_MAX_RESULTS)
+    logger.debug("Web Search %s", node["id"])
 
+    results = []
     try:
-        answer = llm_service.generate(
-            question=query,
-            context=context,
-        )
-        print("  ✅ LLM response generated")
+        service = get_web_search_service()
+        provider = config.get("provider") or service.provider
+        with observe("web_search"):
+            hits = await service.asearch(query, max_results, provider=provider)
+        for hit in hits:
+            results.append({
+                "id": f"web:{hit['url']}",
+                "text": format_results([hit]),
+                "metadata": {"source": "web", "provider": provider, **hit},
+                "score": None,
+            })
+        logger.debug("%d web results", len(results))
 
     except Exception as e:
-        print(f"  ❌ LLM generation failed: {e}")
-        raise ValueError(f"LLM generation failed: {str(e)}")
+        logger.warning("⚠️ Web search failed: %s", e)
+
+    ctx.node_stats[node["id"]] = {"chunks": len(results)}
+    return {
+        "query": query,
+        "results": merged["results"] + results,
+        "namespaces": merged["namespaces"],
+    }
 
-    # --------------------------------------------------
-    # Step 3: Output
-    # --------------------------------------------------
-    print("\n🟡 Step 3: Output Component")
 
+async def _cache_lookup(
+    ctx: RunContext,
+    node: Mapping,
+    query: str,
+    prompt: str,
+    results: List[Dict],
+    namespaces: List[str],
+) -> Tuple[Optional[Tuple], Optional[List[float]], Optional[str], Optional[str]]:
+    """
+    Returns (cache_key, query_embedding, answer, hit_kind).
+    cache_key is None when caching doesn't apply to this execution.
+    """
+    if not ANSWER_CACHE_ENABLED or not ctx.workflow_id:
+        return None, None, None, None
+
+    vector_store = await aget_vector_store()
+    cache = get_answer_cache()
+    key = cache.make_key(
+        workflow_id=f"{ctx.workflow_id}:{node['id']}",
+        chunk_ids=[r["id"] for r in results],
+        prompt=prompt,
+        model=node["data"].get("model", "default"),
+        kb_version=tuple((ns, vector_store.version(ns)) for ns in namespaces),
+    )
+
+    query_embedding = None
+    if cache.similarity:
+        # Already cached by retrieval when the workflow has a KB
+        query_embedding = await EmbeddingService().aembed_query(query)
+
+    answer, hit = cache.lookup(key, query_embedding)
+    CACHE_EVENTS.labels("answer", hit or "miss").inc()
+    if hit:
+        logger.debug("Answer cache hit (%s)", hit)
+    return key, query_embedding, answer, hit
+
+
+def _llm_stats(results: List[Dict], prompt: str, answer: Optional[str]) -> Dict:
+    # answer is None when the model returns no text (e.g. a safety-blocked candidate)
+    return {"chunks": len(results), "prompt_chars": len(prompt), "answer_chars": len(answer or "")}
+
+
+async def run_llm(ctx: RunContext, node: Mapping, inputs: List[Dict]) -> Dict:
+    merged = _merge_inputs(ctx, inputs)
+    query, results = merged["query"], merged["results"]
+    logger.debug("LLM Engine %s", node["id"])
+    with observe("prompt_build"):
+        context = _context(results, merged["answers"])
+        prompt = build_prompt(query, context)
+
+    cache_key, query_embedding, answer, cache_hit = await _cache_lookup(
+        ctx, node, query, prompt, results, merged["namespaces"]
+    )
+
+    if answer is None:
+        try:
+            with observe("llm_call"):
+                answer = await LLMService().agenerate(
+                    question=query,
+                    context=context,
+                )
+            logger.debug("LLM response generated")
+
+        except Exception as e:
+            logger.error("❌ LLM generation failed: %s", e)
+            raise ValueError(f"LLM generation failed: {str(e)}")
+
+        # Empty / blocked answers are not worth replaying
+        if cache_key and answer:
+            get_answer_cache().store(cache_key, answer, query_embedding)
+
+    ctx.cache_hits[node["id"]] = cache_hit
+    ctx.node_stats[node["id"]] = _llm_stats(results, prompt, answer)
     return {
+        "query": query,
+        "results": results,
+        "namespaces": merged["namespaces"],
         "answer": answer,
+    }
+
+
+async def run_output(ctx: RunContext, node: Mapping, inputs: List[Dict]) -> Dict:
+    merged = _merge_inputs(ctx, inputs)
+    logger.debug("Output %s", node["id"])
+    return {
+        "query": merged["query"],
+        "results": merged["results"],
+        "namespaces": merged["namespaces"],
+        "answer": "\n\n".join(merged["answers"]) or None,
+    }
+
+
+async def run_passthrough(ctx: RunContext, node: Mapping, inputs: List[Dict]) -> Dict:
+    merged = _merge_inputs(ctx, inputs)
+    logger.debug("%s %s has no runtime behaviour — passing inputs through", node.get("type"), node["id"])
+    return {
+        "query": merged["query"],
+        "results": merged["results"],
+        "namespaces": merged["namespaces"],
+        "answer": "\n\n".join(merged["answers"]) or None,
+    }
+
+
+NodeHandler = Callable[[RunContext, Mapping, List[Dict]], Awaitable[Dict]]
+
+NODE_HANDLERS: Dict[str, NodeHandler] = {
+    "userQuery": run_user_query,
+    "knowledgeBase": run_knowledge_base,
+    "webSearch": run_web_search,
+    "llmEngine": run_llm,
+    "output": run_output,
+}
+
+
+# --------------------------------------------------
+# Engine
+# --------------------------------------------------
+
+async def run_plan(
+    plan: CompiledWorkflow,
+    ctx: RunContext,
+    only: Optional[Set[int]] = None,
+) -> List[Optional[Dict]]:
+    """
+    Run nodes (all, or just the `only` slots) as soon as their upstream
+    nodes finish, so independent branches execute concurrently.
+    Returns outputs indexed by slot (None for slots not run).
+    """
+    tasks: List[Optional[asyncio.Task]] = [None] * len(plan.node_ids)
+
+    async def run_node(slot: int) -> Dict:
+        inputs = [await tasks[p] for p in plan.predecessors[slot] if tasks[p] is not None]
+
+        node = plan.nodes[slot]
+        handler = NODE_HANDLERS.get(plan.node_types[slot], run_passthrough)
+
+        start = time.perf_counter()
+        output = await handler(ctx, node, inputs)
+        ctx.timings[plan.node_ids[slot]] = {
+            "type": plan.node_types[slot],
+            "ms": round((time.perf_counter() - start) * 1000, 2),
+        }
+        return output
+
+    for slot in plan.order:
+        if only is None or slot in only:
+            tasks[slot] = asyncio.ensure_future(run_node(slot))
+
+    running = [t for t in tasks if t is not None]
+    try:
+        await asyncio.gather(*running)
+    except BaseException:
+        for task in running:
+            task.cancel()
+        raise
+
+    return [t.result() if t is not None else None for t in tasks]
+
+
+def _result(plan: CompiledWorkflow, ctx: RunContext, output: Dict) -> Dict:
+    sources = [r["metadata"] for r in output["results"]]
+    llm_node = plan.nodes[plan.answer_llm_slot]
+    cache_hit = ctx.cache_hits.get(llm_node["id"])
+
+    return {
+        "answer": output["answer"],
         "sources": sources,
-        "has_context": context is not None,
+        "has_context": bool(output["results"]),
         "metadata": {
-            "query": query,
-            "model": llm_config.get("model", "default"),
+            "query": ctx.query,
+            "model": llm_node["data"].get("model", "default"),
             "chunks_used": len(sources),
+            "cached": cache_hit is not None,
+            "cache_hit": cache_hit,
+            "coalesced": False,
+            "timings": ctx.timings,
         },
     }
+
+
+def _trace(plan: CompiledWorkflow, ctx: RunContext, mode: str, start: float, error: Optional[str] = None):
+    """Queue the execution trace of one run (see services.trace_service)"""
+    nodes = {}
+    for node_id, timing in ctx.timings.items():
+        nodes[node_id] = {**timing, **ctx.node_stats.get(node_id, {})}
+        if node_id in ctx.cache_hits:
+            nodes[node_id]["cache_hit"] = ctx.cache_hits[node_id]
+
+    llm_id = plan.node_ids[plan.answer_llm_slot]
+    llm_stats = ctx.node_stats.get(llm_id, {})
+    record_trace(
+        workflow_id=ctx.workflow_id,
+        content_hash=plan.content_hash,
+        mode=mode,
+        total_ms=(time.perf_counter() - start) * 1000,
+        nodes=nodes,
+        chunks_used=llm_stats.get("chunks", 0),
+        prompt_chars=llm_stats.get("prompt_chars"),
+        answer_chars=llm_stats.get("answer_chars"),
+        cache_hit=ctx.cache_hits.get(llm_id),
+        error=error,
+    )
+
+
+def _execution_key(query: str, plan: CompiledWorkflow, workflow_id: Optional[str]) -> Tuple:
+    # Legacy mode (no workflow_id): identify the workflow by its content
+    return workflow_id or f"adhoc_{plan.content_hash}", normalize_query(query)
+
+
+def _resolve_plan(
+    nodes: Optional[List[Dict]],
+    edges: Optional[List[Dict]],
+    plan: Optional[CompiledWorkflow],
+) -> CompiledWorkflow:
+    if plan is not None:
+        return plan
+    return compile_workflow(nodes or [], edges or [])
+
+
+async def execute_workflow(
+    query: str,
+    nodes: Optional[List[Dict]] = None,
+    edges: Optional[List[Dict]] = None,
+    workflow_id: Optional[str] = None,
+    plan: Optional[CompiledWorkflow] = None,
+    coalesce: bool = True,
+) -> Dict:
+    """
+    Run the workflow, coalescing with any identical execution (same
+    workflow, same normalised query) that is already in flight, unless
+    `coalesce` is False (e.g. when this run is being profiled).
+
+    Pass a precompiled `plan` (see core.workflow_registry) to skip graph
+    processing entirely; otherwise nodes/edges are compiled for this call.
+    """
+    plan = _resolve_plan(nodes, edges, plan)
+    with WORKFLOW_SECONDS.labels("execute").time():
+        if not coalesce:
+            return await _run_workflow(query, plan, workflow_id)
+        result, shared = await _executions.do(
+            _execution_key(query, plan, workflow_id),
+            lambda: _run_workflow(query, plan, workflow_id),
+        )
+
+    if shared:
+        logger.debug("Coalesced with in-flight execution")
+        result = {**result, "metadata": {**result["metadata"], "query": query, "coalesced": True}}
+    return result
+
+
+async def _run_workflow(
+    query: str,
+    plan: CompiledWorkflow,
+    workflow_id: Optional[str] = None,
+    prefetched: Optional[Dict[str, List[Dict]]] = None,
+    mode: str = "execute",
+) -> Dict:
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Workflow execution start, plan %s, query %r", _dump_plan(plan), query)
+
+    start = time.perf_counter()
+    ctx = RunContext(query=query, workflow_id=workflow_id, prefetched=prefetched or {})
+
+    try:
+        outputs = await run_plan(plan, ctx)
+    except Exception as e:
+        _trace(plan, ctx, mode, start, error=str(e) or type(e).__name__)
+        raise
+
+    _trace(plan, ctx, mode, start)
+    return _result(plan, ctx, outputs[plan.output_slot])
+
+
+async def _prefetch_retrieval(plan: CompiledWorkflow, queries: List[str]) -> List[Dict[str, List[Dict]]]:
+    """
+    Retrieval for every (knowledgeBase node, query) pair up front: one
+    batched encode for all queries, then one multi-query Chroma call per
+    vector-mode node. Hybrid nodes still search per query (with the
+    embeddings already cached).
+    """
+    prefetched: List[Dict[str, List[Dict]]] = [{} for _ in queries]
+    kb_slots = plan.slots_of_type("knowledgeBase")
+    if not kb_slots:
+        return prefetched
+
+    start = time.perf_counter()
+    embeddings = await EmbeddingService().aembed_queries(queries)
+    logger.info("Embedded %d queries in %.0fms", len(queries), (time.perf_counter() - start) * 1000)
+
+    vector_store = await aget_vector_store()
+    for slot in kb_slots:
+        node = plan.nodes[slot]
+        namespace, mode, top_k = _kb_settings(node)
+        if mode != "vector":
+            continue
+        try:
+            with observe("vector_search"):
+                per_query = await asyncio.to_thread(
+                    vector_store.similarity_search_many,
+                    query_embeddings=embeddings,
+                    k=top_k,
+                    namespace=namespace,
+                )
+        except Exception as e:
+            logger.warning("⚠️ Batched retrieval for %s failed, falling back per query: %s", node["id"], e)
+            continue
+        for i, results in enumerate(per_query):
+            prefetched[i][node["id"]] = results
+
+    return prefetched
+
+
+async def execute_batch(
+    queries: List[str],
+    plan: CompiledWorkflow,
+    workflow_id: Optional[str] = None,
+    concurrency: int = BATCH_CONCURRENCY,
+) -> AsyncIterator[Dict]:
+    """
+    Run many queries through one workflow, yielding one result per query
+    as it completes (not in input order; each carries its `index`).
+    """
+    logger.info("🟢 Batch execution start (%d queries)", len(queries))
+    prefetched = await _prefetch_retrieval(plan, queries)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run_one(index: int) -> Dict:
+        query = queries[index]
+        async with semaphore:
+            try:
+                with WORKFLOW_SECONDS.labels("batch").time():
+                    result = await _run_workflow(query, plan, workflow_id, prefetched[index], mode="batch")
+            except ValueError as e:
+                logger.warning("⚠️ Batch query %d failed: %s", index, e)
+                return {"index": index, "query": query, "success": False, "error": str(e)}
+            except Exception as e:
+                logger.error("❌ Batch query %d failed: %s", index, e)
+                return {"index": index, "query": query, "success": False, "error": "Execution failed"}
+        return {"index": index, "query": query, "success": True, **result}
+
+    tasks = [asyncio.ensure_future(run_one(i)) for i in range(len(queries))]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Client went away: don't keep spending LLM calls
+        for task in tasks:
+            task.cancel()
+
+
+def check_streamable(plan: CompiledWorkflow):
+    """
+    Streaming sends one LLM's tokens; an output that joins the answers of
+    several LLM branches can only be run with execute_workflow.
+    """
+    if len(plan.answer_llm_slots) > 1:
+        llm_ids = ", ".join(plan.node_ids[s] for s in plan.answer_llm_slots)
+        raise ValueError(
+            f"Streaming needs a single LLM feeding the output, this workflow joins {llm_ids}; "
+            "use /api/execute instead"
+        )
+
+
+async def stream_workflow(
+    query: str,
+    nodes: Optional[List[Dict]] = None,
+    edges: Optional[List[Dict]] = None,
+    workflow_id: Optional[str] = None,
+    plan: Optional[CompiledWorkflow] = None,
+) -> AsyncIterator[Dict]:
+    """
+    Streaming variant of execute_workflow.
+
+    Runs everything upstream of the LLM node that feeds the output, then
+    streams that LLM's answer (ValueError if several LLMs feed it, see
+    check_streamable). Yields events in order:
+    - {"event": "sources", ...} once retrieval is done
+    - {"event": "token", "text": ...} per answer piece from the LLM
+    - {"event": "metadata", ...} at the end
+    """
+
+    stream_start = time.perf_counter()
+    plan = _resolve_plan(nodes, edges, plan)
+    check_streamable(plan)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Workflow stream start, plan %s, query %r", _dump_plan(plan), query)
+    ctx = RunContext(query=query, workflow_id=workflow_id)
+
+    try:
+        async for event in _stream_events(plan, ctx):
+            yield event
+    except Exception as e:
+        _trace(plan, ctx, "stream", stream_start, error=str(e) or type(e).__name__)
+        raise
+
+    _trace(plan, ctx, "stream", stream_start)
+    WORKFLOW_SECONDS.labels("stream").observe(time.perf_counter() - stream_start)
+
+
+async def _stream_events(plan: CompiledWorkflow, ctx: RunContext) -> AsyncIterator[Dict]:
+    llm_slot = plan.answer_llm_slot
+    llm_node = plan.nodes[llm_slot]
+    llm_id = llm_node["id"]
+
+    outputs = await run_plan(plan, ctx, only=plan.ancestors[llm_slot])
+    merged = _merge_inputs(ctx, [outputs[p] for p in plan.predecessors[llm_slot]])
+    query_in, results = merged["query"], merged["results"]
+    with observe("prompt_build"):
+        context = _context(results, merged["answers"])
+        prompt = build_prompt(query_in, context)
+
+    yield {
+        "event": "sources",
+        "sources": [r["metadata"] for r in results],
+        "has_context": bool(results),
+    }
+
+    logger.debug("LLM Engine %s (streaming)", llm_id)
+    start = time.perf_counter()
+
+    cache_key, query_embedding, answer, cache_hit = await _cache_lookup(
+        ctx, llm_node, query_in, prompt, results, merged["namespaces"]
+    )
+
+    if answer is not None:
+        yield {"event": "token", "text": answer}
+    else:
+        pieces = []
+        with observe("llm_call"):
+            async for text in LLMService().stream_generate(question=query_in, context=context):
+                pieces.append(text)
+                yield {"event": "token", "text": text}
+
+        logger.debug("LLM stream finished")
+        answer = "".join(pieces)
+        if cache_key and answer:
+            get_answer_cache().store(cache_key, answer, query_embedding)
+
+    ctx.cache_hits[llm_id] = cache_hit
+    ctx.node_stats[llm_id] = _llm_stats(results, prompt, answer)
+    ctx.timings[llm_id] = {
+        "type": "llmEngine",
+        "ms": round((time.perf_counter() - start) * 1000, 2),
+    }
+
+    result = _result(plan, ctx, {"results": results, "answer": answer})
+    yield {"event": "metadata", "metadata": result["metadata"]}
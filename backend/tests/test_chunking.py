@@ -0,0 +1,44 @@
+from utils.chunking import estimate_token_spans, iter_chunks
+
+
+def fitz_pages(n_pages: int, lines_per_page: int = 40) -> list:
+    # Like fitz get_text(): one line per "\n", no blank lines between paragraphs
+    return [
+        "".join(f"Page {p} line {i} describes the pump valve and its pressure sensor.\n"
+                for i in range(lines_per_page))
+        for p in range(n_pages)
+    ]
+
+
+def test_single_newline_pages_are_attributed_to_their_page():
+    pages = fitz_pages(20)
+    chunks = list(iter_chunks(pages, max_tokens=100, overlap_tokens=10))
+
+    seen_pages = {page for _, page in chunks}
+    assert seen_pages == set(range(20))
+    for chunk, page in chunks:
+        assert chunk.startswith(f"Page {page} ") or f"Page {page} " in chunk
+
+
+def test_chunks_are_yielded_lazily():
+    pulled = []
+
+    def pages():
+        for i, page in enumerate(fitz_pages(50)):
+            pulled.append(i)
+            yield page
+
+    chunks = iter_chunks(pages(), max_tokens=100, overlap_tokens=10)
+    next(chunks)
+    assert len(pulled) == 1
+
+
+def test_unpunctuated_text_is_cut_on_tokens_with_overlap():
+    words = [f"w{i}" for i in range(1000)]
+    chunks = [c for c, _ in iter_chunks([" ".join(words)], max_tokens=100, overlap_tokens=20)]
+
+    for chunk in chunks:
+        assert len(estimate_token_spans(chunk)) <= 100
+    first, second = chunks[0].split(), chunks[1].split()
+    assert first[-20:] == second[:20]
+    assert chunks[-1].split()[-1] == "w999"
@@ -0,0 +1,148 @@
+import asyncio
+
+import pytest
+
+import services.workflow_executor as executor
+from core.workflow_compiler import compile_workflow
+from services.workflow_executor import RunContext, run_plan
+
+
+def node(node_id: str, node_type: str) -> dict:
+    return {"id": node_id, "type": node_type, "data": {}}
+
+
+def edge(source: str, target: str) -> dict:
+    return {"source": source, "target": target}
+
+
+# q -> kb1 -> llm -> out
+#   -> kb2 ->
+NODES = [
+    node("q", "userQuery"),
+    node("kb1", "knowledgeBase"),
+    node("kb2", "knowledgeBase"),
+    node("llm", "llmEngine"),
+    node("out", "output"),
+]
+EDGES = [edge("q", "kb1"), edge("q", "kb2"), edge("kb1", "llm"), edge("kb2", "llm"), edge("llm", "out")]
+
+
+@pytest.fixture
+def handlers(monkeypatch):
+    """Fake handlers: every node returns its id plus the ids of its inputs"""
+    calls = []
+
+    async def fake(ctx, n, inputs):
+        calls.append(n["id"])
+        return {"id": n["id"], "inputs": sorted(i["id"] for i in inputs)}
+
+    table = {t: fake for t in ("userQuery", "knowledgeBase", "llmEngine", "output")}
+    monkeypatch.setattr(executor, "NODE_HANDLERS", table)
+    return table, calls
+
+
+def run(plan, only=None):
+    return asyncio.run(run_plan(plan, RunContext(query="q"), only=only))
+
+
+def test_compiled_order_is_topological():
+    plan = compile_workflow(NODES, EDGES)
+    position = {plan.node_ids[s]: i for i, s in enumerate(plan.order)}
+
+    for e in EDGES:
+        assert position[e["source"]] < position[e["target"]]
+    assert plan.node_ids[plan.output_slot] == "out"
+    assert plan.node_ids[plan.answer_llm_slot] == "llm"
+
+
+def test_cycle_is_rejected():
+    nodes = NODES + [node("llm2", "llmEngine")]
+    edges = EDGES + [edge("llm", "llm2"), edge("llm2", "kb1")]
+
+    with pytest.raises(ValueError, match="cycle"):
+        compile_workflow(nodes, edges)
+
+
+def test_edge_to_unknown_node_is_rejected():
+    with pytest.raises(ValueError, match="unknown node"):
+        compile_workflow(NODES, EDGES + [edge("llm", "missing")])
+
+
+def test_duplicate_edges_feed_a_node_once():
+    plan = compile_workflow(NODES, EDGES + [edge("llm", "out")])
+    llm = plan.node_ids.index("llm")
+
+    assert plan.predecessors[plan.output_slot] == (llm,)
+
+
+def test_nodes_receive_upstream_outputs(handlers):
+    _, calls = handlers
+    plan = compile_workflow(NODES, EDGES)
+
+    outputs = run(plan)
+
+    assert outputs[plan.node_ids.index("llm")]["inputs"] == ["kb1", "kb2"]
+    assert outputs[plan.output_slot]["inputs"] == ["llm"]
+    assert calls.index("q") < calls.index("kb1") < calls.index("llm") < calls.index("out")
+    assert calls.index("kb2") < calls.index("llm")
+
+
+def test_independent_branches_run_concurrently(handlers):
+    table, _ = handlers
+    started = []
+    both_started = None
+
+    async def knowledge_base(ctx, n, inputs):
+        started.append(n["id"])
+        if len(started) == 2:
+            both_started.set()
+        # Deadlocks (and times out) unless the other branch runs meanwhile
+        await asyncio.wait_for(both_started.wait(), timeout=1)
+        return {"id": n["id"], "inputs": []}
+
+    table["knowledgeBase"] = knowledge_base
+    plan = compile_workflow(NODES, EDGES)
+
+    async def main():
+        nonlocal both_started
+        both_started = asyncio.Event()
+        return await run_plan(plan, RunContext(query="q"))
+
+    outputs = asyncio.run(main())
+    assert sorted(started) == ["kb1", "kb2"]
+    assert outputs[plan.output_slot]["inputs"] == ["llm"]
+
+
+def test_only_runs_the_requested_slots(handlers):
+    _, calls = handlers
+    plan = compile_workflow(NODES, EDGES)
+    llm = plan.answer_llm_slot
+
+    # What streaming does: everything upstream of the answering LLM
+    outputs = run(plan, only=plan.ancestors[llm])
+
+    assert sorted(calls) == ["kb1", "kb2", "q"]
+    assert outputs[llm] is None
+    assert outputs[plan.output_slot] is None
+
+
+def test_failure_cancels_running_branches(handlers):
+    table, _ = handlers
+    cancelled = []
+
+    async def knowledge_base(ctx, n, inputs):
+        if n["id"] == "kb1":
+            raise ValueError("kb1 failed")
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(n["id"])
+            raise
+        return {"id": n["id"], "inputs": []}
+
+    table["knowledgeBase"] = knowledge_base
+    plan = compile_workflow(NODES, EDGES)
+
+    with pytest.raises(ValueError, match="kb1 failed"):
+        run(plan)
+    assert cancelled == ["kb2"]
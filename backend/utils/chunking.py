@@ -1,3 +1,7 @@
+import re
+from typing import Callable, Iterable, Iterator, List, Tuple
+
+
 def chunk_text(text: str, chunk_size: int = 700, overlap: int = 100) -> list[str]:
     if not text or not text.strip():
         return []
@@ -19,3 +23,115 @@ def chunk_text(text: str, chunk_size: int = 700, overlap: int = 100) -> list[str
         start += chunk_size - overlap
 
     return chunks
+
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[]?[A-Z0-9])")
+_WORDISH = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_token_spans(text: str) -> List[Tuple[int, int]]:
+    """Cheap stand-in for a real tokenizer: (start, end) of words and punctuation marks"""
+    return [m.span() for m in _WORDISH.finditer(text)]
+
+
+def _sentences(pages: Iterable[str]) -> Iterator[Tuple[str, int, bool]]:
+    """
+    Yield (sentence, page_index, starts_paragraph) one page at a time, so
+    at most one page is ever buffered. PDF text usually breaks lines with a
+    single newline; those are plain whitespace here, only blank lines end a
+    paragraph. A paragraph running off the end of a page is continued on
+    the next one (its first sentence there doesn't start a paragraph).
+    """
+    continues = False
+
+    for page_index, text in enumerate(pages):
+        paragraphs = _PARAGRAPH_BREAK.split(text)
+        for i, paragraph in enumerate(paragraphs):
+            paragraph = " ".join(paragraph.split())
+            if not paragraph:
+                continue
+            new_paragraph = not (i == 0 and continues)
+            for sentence in _SENTENCE_END.split(paragraph):
+                yield sentence, page_index, new_paragraph
+                new_paragraph = False
+        continues = bool(paragraphs[-1].strip())
+
+
+def _split_long(
+    sentence: str, spans: List[Tuple[int, int]], max_tokens: int, overlap_tokens: int
+) -> Iterator[Tuple[str, int]]:
+    """
+    Last resort for a sentence over budget: cut it on token offsets into
+    windows of max_tokens, consecutive windows sharing overlap_tokens.
+    """
+    step = max_tokens - overlap_tokens
+    start = 0
+    while True:
+        window = spans[start:start + max_tokens]
+        yield sentence[window[0][0]:window[-1][1]], len(window)
+        if start + max_tokens >= len(spans):
+            return
+        start += step
+
+
+def iter_chunks(
+    pages: Iterable[str],
+    max_tokens: int = 200,
+    overlap_tokens: int = 30,
+    token_spans: Callable[[str], List[Tuple[int, int]]] = estimate_token_spans,
+) -> Iterator[Tuple[str, int]]:
+    """
+    Structure-aware streaming chunker.
+
+    Packs whole sentences into chunks of at most max_tokens (as measured by
+    token_spans, ideally the embedding model's tokenizer), starting a new
+    chunk rather than cutting a word or sentence. Consecutive chunks share
+    up to overlap_tokens worth of trailing sentences. Paragraph breaks are
+    kept inside a chunk. Pages are consumed lazily and chunks are yielded
+    as soon as they are full, as (chunk, page_index) where page_index is
+    the page the chunk's first sentence is on.
+    """
+    if overlap_tokens >= max_tokens:
+        raise ValueError("overlap_tokens must be smaller than max_tokens")
+
+    current = []        # (text, tokens, page_index, starts_paragraph)
+    current_tokens = 0
+
+    def render(units) -> str:
+        out = ""
+        for text, _, _, new_paragraph in units:
+            if out:
+                out += "\n\n" if new_paragraph else " "
+            out += text
+        return out
+
+    for sentence, page_index, new_paragraph in _sentences(pages):
+        spans = token_spans(sentence)
+        if not spans:
+            continue
+        pieces = [(sentence, len(spans))] if len(spans) <= max_tokens else \
+            _split_long(sentence, spans, max_tokens, overlap_tokens)
+
+        for text, tokens in pieces:
+            if current and current_tokens + tokens > max_tokens:
+                yield render(current), current[0][2]
+
+                # Carry trailing sentences forward as overlap
+                carry, carry_tokens = [], 0
+                for unit in reversed(current):
+                    if carry_tokens + unit[1] > overlap_tokens:
+                        break
+                    carry.insert(0, unit)
+                    carry_tokens += unit[1]
+                while carry and carry_tokens + tokens > max_tokens:
+                    carry_tokens -= carry.pop(0)[1]
+
+                current, current_tokens = carry, carry_tokens
+
+            current.append((text, tokens, page_index, new_paragraph))
+            current_tokens += tokens
+            new_paragraph = False
+
+    if current:
+        yield render(current), current[0][2]
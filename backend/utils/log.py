@@ -0,0 +1,49 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+
+# DEBUG shows per-node / per-batch detail; INFO keeps request-level events
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+_listener = None
+
+
+def setup_logging():
+    """
+    Route all app logging through a queue: request handlers only enqueue
+    records and a background thread does the (blocking) stdout writes.
+    Safe to call more than once.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    records: queue.Queue = queue.Queue(-1)
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    root = logging.getLogger("app")
+    root.setLevel(LOG_LEVEL)
+    root.addHandler(logging.handlers.QueueHandler(records))
+    root.propagate = False
+
+    _listener = logging.handlers.QueueListener(records, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Flush queued records (called at shutdown)"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    setup_logging()
+    return logging.getLogger(f"app.{name}")
@@ -0,0 +1,103 @@
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+)
+
+# Seconds; covers sub-ms cache hits up to slow LLM calls
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 80.0,
+)
+
+# Pipeline stages:
+#   query: query_embed, vector_search, web_search, prompt_build, llm_call
+#   ingestion: pdf_parse, chunk, embed, store
+STAGE_SECONDS = Histogram(
+    "pipeline_stage_seconds",
+    "Latency of each pipeline stage",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+
+WORKFLOW_SECONDS = Histogram(
+    "workflow_execution_seconds",
+    "End-to-end workflow execution latency",
+    ["mode"],
+    buckets=LATENCY_BUCKETS,
+)
+
+CACHE_EVENTS = Counter(
+    "cache_events_total",
+    "Cache lookups by cache and outcome",
+    ["cache", "outcome"],
+)
+
+ERRORS = Counter(
+    "errors_total",
+    "Errors by pipeline stage",
+    ["stage"],
+)
+
+
+@contextmanager
+def observe(stage: str):
+    """Time a block into STAGE_SECONDS; count an error if it raises"""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        ERRORS.labels(stage).inc()
+        raise
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - start)
+
+
+def cache_event(cache: str, hit: bool, count: int = 1):
+    if count:
+        CACHE_EVENTS.labels(cache, "hit" if hit else "miss").inc(count)
+
+
+class TimedIterator:
+    """
+    Wraps an iterator, observing the time spent producing each item into
+    `stage`; `seconds` is the running total (for subtracting from a loop
+    that interleaves several stages).
+    """
+
+    def __init__(self, iterable, stage: str):
+        self._it = iter(iterable)
+        self._stage = stage
+        self.seconds = 0.0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            return next(self._it)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.seconds += elapsed
+            STAGE_SECONDS.labels(self._stage).observe(elapsed)
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """
+    Exposition for GET /metrics. Under gunicorn with several workers set
+    PROMETHEUS_MULTIPROC_DIR so all workers' samples are aggregated.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,111 @@
+import hmac
+import os
+import re
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+from utils.log import get_logger
+
+logger = get_logger(__name__)
+
+# Per-request sampling profiles (pyinstrument). Off unless PROFILING_ENABLED;
+# then a request opts in with `X-Profile: 1` or `?profile=1` — or, when
+# PROFILE_TOKEN is set, with that token as the header / query value.
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "profiles")))
+# Sampling interval in seconds
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.001"))
+# Only the newest profiles are kept on disk
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+_PROFILE_ID = re.compile(r"^[a-z_]+-\d+-[0-9a-f]{8}$")
+
+
+def profile_requested(request) -> bool:
+    """Whether this request asked for a profile (always False when disabled)"""
+    if not PROFILING_ENABLED:
+        return False
+
+    flag = request.headers.get(PROFILE_HEADER) or request.query_params.get("profile")
+    if not flag:
+        return False
+    if PROFILE_TOKEN:
+        return hmac.compare_digest(flag.encode(), PROFILE_TOKEN.encode())
+    return flag.lower() in ("1", "true", "yes")
+
+
+class ProfileSession:
+    """Set on exit of `profiled`: id of the stored profile (None if not taken)"""
+
+    def __init__(self, label: str):
+        self.label = label
+        self.profile_id: Optional[str] = None
+
+
+@contextmanager
+def profiled(enabled: bool, label: str, async_mode: str = "enabled"):
+    """
+    Run the block under pyinstrument when `enabled`, then store the HTML
+    profile. Use async_mode="disabled" when profiling inside a worker thread.
+    """
+    session = ProfileSession(label)
+    if not enabled:
+        yield session
+        return
+
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        logger.warning("⚠️ Profile requested but pyinstrument is not installed")
+        yield session
+        return
+
+    profiler = Profiler(interval=PROFILE_INTERVAL, async_mode=async_mode)
+    profiler.start()
+    try:
+        yield session
+    finally:
+        profiler.stop()
+        session.profile_id = _store(profiler, label)
+
+
+def run_profiled(enabled: bool, label: str, fn, *args, **kwargs):
+    """Call fn (in the current thread) under `profiled`; returns (result, profile_id)"""
+    with profiled(enabled, label, async_mode="disabled") as session:
+        result = fn(*args, **kwargs)
+    return result, session.profile_id
+
+
+def _store(profiler, label: str) -> Optional[str]:
+    profile_id = f"{label}-{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}"
+    try:
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        (PROFILE_DIR / f"{profile_id}.html").write_text(profiler.output_html(), encoding="utf-8")
+        _prune()
+    except Exception as e:
+        logger.warning("⚠️ Failed to store profile %s: %s", profile_id, e)
+        return None
+    logger.info("🔬 Stored profile %s", profile_id)
+    return profile_id
+
+
+def _prune():
+    profiles = sorted(PROFILE_DIR.glob("*.html"), key=lambda p: p.stat().st_mtime)
+    for old in profiles[:max(0, len(profiles) - PROFILE_KEEP)]:
+        old.unlink(missing_ok=True)
+
+
+def profile_path(profile_id: str) -> Optional[Path]:
+    """Stored profile file for an id, or None (ids are validated, no path tricks)"""
+    if not _PROFILE_ID.match(profile_id):
+        return None
+    path = PROFILE_DIR / f"{profile_id}.html"
+    return path if path.exists() else None
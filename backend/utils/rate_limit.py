@@ -0,0 +1,49 @@
+import asyncio
+import time
+
+
+class AsyncRateLimiter:
+    """
+    Token bucket for async callers: `rate` acquisitions per second on
+    average, with bursts of up to `burst`. Callers over the limit wait
+    instead of failing.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = None
+        self.waits = 0
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return  # unlimited
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        # Serialised so waiters are served in arrival order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                self.waits += 1
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def stats(self) -> dict:
+        return {"rate": self.rate, "burst": self.burst, "waits": self.waits}
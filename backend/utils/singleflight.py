@@ -0,0 +1,42 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one in-flight run.
+
+    The first caller starts the work; callers arriving while it is still
+    running await the same task and get the same result (or exception).
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.deduplicated = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Returns (result, shared) where shared is True if this caller
+        piggybacked on another caller's run.
+        """
+        self.calls += 1
+
+        task = self._inflight.get(key)
+        shared = task is not None
+        if shared:
+            self.deduplicated += 1
+        else:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+
+        # shield: one caller disconnecting must not cancel the others' run
+        return await asyncio.shield(task), shared
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._inflight),
+            "calls": self.calls,
+            "deduplicated": self.deduplicated,
+        }
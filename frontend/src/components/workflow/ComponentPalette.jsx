@@ -1,6 +1,7 @@
 const components = [
   { type: "userQuery", label: "User Query" },
   { type: "knowledgeBase", label: "Knowledge Base" },
+  { type: "webSearch", label: "Web Search" },
   { type: "llmEngine", label: "LLM Engine" },
   { type: "output", label: "Output" },
 ];
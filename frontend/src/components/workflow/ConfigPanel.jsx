@@ -30,6 +30,51 @@ export default function ConfigPanel({ node, updateNode }) {
         </div>
       );
 
+    case "knowledgeBase":
+      return (
+        <div className="p-4">
+          <h3 className="font-bold mb-2">Knowledge Base</h3>
+          <input
+            className="border p-2 w-full"
+            placeholder="Namespace (default: documents)"
+            value={node.data.namespace || ""}
+            onChange={(e) =>
+              handleChange("namespace", e.target.value)
+            }
+          />
+        </div>
+      );
+
+    case "webSearch":
+      return (
+        <div className="p-4">
+          <h3 className="font-bold mb-2">Web Search</h3>
+          <select
+            className="border p-2 w-full mb-2"
+            value={node.data.provider || ""}
+            onChange={(e) =>
+              handleChange("provider", e.target.value)
+            }
+          >
+            <option value="">Default provider</option>
+            <option value="serpapi">SerpAPI</option>
+            <option value="brave">Brave</option>
+          </select>
+
+          <input
+            type="number"
+            min="1"
+            max="20"
+            className="border p-2 w-full"
+            placeholder="Max results"
+            value={node.data.max_results || 5}
+            onChange={(e) =>
+              handleChange("max_results", e.target.value)
+            }
+          />
+        </div>
+      );
+
     case "llmEngine":
       return (
         <div className="p-4">
@@ -8,6 +8,7 @@ import "reactflow/dist/style.css";
 
 import UserQueryNode from "./nodes/UserQueryNode";
 import KnowledgeBaseNode from "./nodes/KnowledgeBaseNode";
+import WebSearchNode from "./nodes/WebSearchNode";
 import LLMEngineNode from "./nodes/LLMEngineNode";
 import OutputNode from "./nodes/OutputNode";
 
@@ -16,6 +17,7 @@ const API_BASE = import.meta.env.VITE_API_BASE_URL ?? "";
 const nodeTypes = {
   userQuery: UserQueryNode,
   knowledgeBase: KnowledgeBaseNode,
+  webSearch: WebSearchNode,
   llmEngine: LLMEngineNode,
   output: OutputNode,
 };
@@ -15,6 +15,9 @@ export default function KnowledgeBaseNode({ data }) {
 
     const formData = new FormData();
     formData.append("file", file);
+    if (data?.namespace) {
+      formData.append("namespace", data.namespace);
+    }
 
     try {
       const res = await fetch(`${API_BASE}/documents/upload`, {
@@ -0,0 +1,19 @@
+import { Handle, Position } from "reactflow";
+
+export default function WebSearchNode({ data }) {
+  return (
+    <div className="w-64 rounded-xl bg-white border border-gray-200 shadow-sm p-4">
+      <Handle type="target" position={Position.Left} />
+
+      <h3 className="text-sm font-semibold text-gray-800 mb-2">
+        Web Search
+      </h3>
+
+      <p className="text-xs text-gray-500">
+        {data?.provider || "Default provider"} · {data?.max_results || 5} results
+      </p>
+
+      <Handle type="source" position={Position.Right} />
+    </div>
+  );
+}